@@ -0,0 +1,218 @@
+# This code is part of QuAwesome.
+#
+#    MIT License
+#
+#    Copyright (c) 2020 and later, Yi-Te Huang
+#
+#    Permission is hereby granted, free of charge, to any person obtaining a copy
+#    of this software and associated documentation files (the "Software"), to deal
+#    in the Software without restriction, including without limitation the rights
+#    to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#    copies of the Software, and to permit persons to whom the Software is
+#    furnished to do so, subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be included in all
+#    copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#    IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#    FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#    LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#    OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#    SOFTWARE.
+#######################################################################################
+from QuAwesome.exceptions import QuAwesomeError as ERROR
+from QuAwesome import Device
+from datetime import datetime
+import numpy as np
+import json
+import time
+import os
+
+# fields of each qubit (S x N arrays) and each gate (S x G arrays)
+QUBIT_FIELDS = ['T1', 'T2', 'Gamma1', 'Gamma2', 'readout_error']
+GATE_FIELDS  = ['gate_time', 'gate_error']
+
+class CalibrationStore:
+    def __init__(self, directory):
+        """
+        A columnar time-series store of the calibration data of Device snapshots.
+        Each field is stored in its own binary file as a (number of snapshots) x (number of qubits or gates) array
+        of float64, which is memory-mapped for the queries, and a row is appended for each snapshot.
+        The gates are the columns of the gate fields, indexed by (gate name, qubit tuple), and the new gates
+        of later snapshots are added as new columns (NaN for the earlier snapshots).
+
+        Inputs:
+            directory - the directory of the store (created if it doesn't exist)
+
+        Functions
+            - append(device, timestamp=None):
+                append the snapshot of the device, at the given timestamp (datetime or POSIX time in seconds)
+                [Default as None: now], which should not be earlier than the last one
+            - getTimestamps():
+                return the array of timestamps (POSIX time in seconds) of all snapshots
+            - getGates():
+                return the list of (gate name, qubit tuple) of the columns of the gate fields
+            - query(field, start=None, end=None, index=None):
+                return (timestamps, values) of the field for the snapshots between start and end (both included),
+                where values is an S x N (or S x G) array, or an array with length S for the given index
+                (qubit index, or (gate name, qubit tuple) for the gate fields)
+            - getDevice(timestamp=None):
+                return the Device of the last snapshot at (or before) the timestamp [Default as None: the last one]
+        """
+        self.__dir = directory
+        os.makedirs(directory, exist_ok=True)
+
+        meta = os.path.join(directory, 'meta.json')
+        if(os.path.isfile(meta)):
+            with open(meta, 'r') as f:
+                self.__meta = json.load(f)
+        else:
+            self.__meta = {'N': None, 'count': 0, 'gates': [], 'names': []}
+        self.__columns = {(name, tuple(qubits)): col for (col, (name, qubits)) in enumerate(self.__meta['gates'])}
+
+    def __len__(self):
+        return self.__meta['count']
+
+    def append(self, device, timestamp=None):
+        if(not isinstance(device, Device)): raise ERROR("The device should be an QuAwesome.Device type object")
+        timestamp = time.time() if (timestamp is None) else self.__Seconds(timestamp)
+        count     = self.__meta['count']
+        if((count > 0) and (timestamp < self.getTimestamps()[-1])):
+            raise ERROR("The snapshots should be appended in order of time")
+        if(self.__meta['N'] is None):
+            self.__meta['N'] = device.getN()
+        elif(device.getN() != self.__meta['N']):
+            raise ERROR("The device should have " + str(self.__meta['N']) + " qubits")
+
+        # row of each qubit field
+        N      = self.__meta['N']
+        calib  = device.getCalibration()
+        config = device.getQubitConfig()
+        rows   = {}
+        for field in ['T1', 'T2', 'readout_error']:
+            if(calib is not None):
+                rows[field] = calib[field]
+            else:
+                rows[field] = [config[n].get(field, np.nan) if (n < len(config)) else np.nan for n in range(N)]
+        rows['Gamma1'] = device.getGamma1_list() if (len(device.getGamma1_list()) == N) else [np.nan] * N
+        rows['Gamma2'] = device.getGamma2_list() if (len(device.getGamma2_list()) == N) else [np.nan] * N
+
+        # row of each gate field, where the new gates are added as new columns
+        table = device.getGateTable()
+        keys  = [(str(name), tuple([int(q) for q in qubits if q >= 0])) for (name, qubits) in zip(table.getNames(), table.getQubits())]
+        new   = [key for key in keys if key not in self.__columns]
+        if(len(new) > 0):
+            self.__Widen(new)
+        G = len(self.__meta['gates'])
+        rows['gate_time']  = np.full(G, np.nan)
+        rows['gate_error'] = np.full(G, np.nan)
+        cols = [self.__columns[key] for key in keys]
+        rows['gate_time'][cols]  = table.getTimes()
+        rows['gate_error'][cols] = table.getErrors()
+        rows['timestamp'] = [timestamp]
+
+        # append the rows (discarding the rows of an interrupted append), then commit the count
+        for (field, row) in rows.items():
+            width = 1 if (field == 'timestamp') else (N if (field in QUBIT_FIELDS) else G)
+            with open(self.__File(field), 'ab') as f:
+                f.truncate(count * width * 8)
+                f.write(np.asarray(row, dtype=np.float64).tobytes())
+        self.__meta['names'].append(device.getName())
+        self.__meta['count'] = count + 1
+        self.__Commit()
+
+    def getTimestamps(self):
+        return self.__Map('timestamp', None)
+
+    def getGates(self): return [(name, tuple(qubits)) for (name, qubits) in self.__meta['gates']]
+
+    def query(self, field, start=None, end=None, index=None):
+        if(field not in QUBIT_FIELDS + GATE_FIELDS):
+            raise ERROR("field should be one of " + ', '.join(QUBIT_FIELDS + GATE_FIELDS))
+
+        # binary search of the time range
+        timestamps = self.getTimestamps()
+        lo = 0 if (start is None) else int(np.searchsorted(timestamps, self.__Seconds(start), side='left'))
+        hi = len(timestamps) if (end is None) else int(np.searchsorted(timestamps, self.__Seconds(end), side='right'))
+        values = self.__Map(field, self.__meta['N'] if (field in QUBIT_FIELDS) else len(self.__meta['gates']))
+
+        if(index is None):
+            return (np.array(timestamps[lo:hi]), np.array(values[lo:hi]))
+        if(field in QUBIT_FIELDS):
+            if(not isinstance(index, int) or (index < 0) or (index >= self.__meta['N'])): raise ERROR("Qubit Index is illegal")
+            col = index
+        else:
+            key = (index[0], tuple(index[1])) if isinstance(index, tuple) and (len(index) == 2) else None
+            if(key not in self.__columns): raise ERROR("The gate " + str(index) + " doesn't exist in the store")
+            col = self.__columns[key]
+        return (np.array(timestamps[lo:hi]), np.array(values[lo:hi, col]))
+
+    def getDevice(self, timestamp=None):
+        if(self.__meta['count'] == 0): raise ERROR("The store is empty")
+        timestamps = self.getTimestamps()
+        s = len(timestamps) - 1 if (timestamp is None) else int(np.searchsorted(timestamps, self.__Seconds(timestamp), side='right')) - 1
+        if(s < 0): raise ERROR("There is no snapshot before the given timestamp")
+
+        # the gates known at the snapshot
+        G      = len(self.__meta['gates'])
+        times  = np.array(self.__Map('gate_time', G)[s])
+        errors = np.array(self.__Map('gate_error', G)[s])
+        cols   = np.nonzero(np.isfinite(times) | np.isfinite(errors))[0]
+        width  = max([len(self.__meta['gates'][c][1]) for c in cols] + [1])
+        qubits = np.full((len(cols), width), -1, dtype=np.int64)
+        for (i, c) in enumerate(cols):
+            qubits[i, :len(self.__meta['gates'][c][1])] = self.__meta['gates'][c][1]
+
+        calib = {field: np.array(self.__Map(field, self.__meta['N'])[s]) for field in QUBIT_FIELDS}
+        calib.update({
+            'name'       : self.__meta['names'][s],
+            'gate_name'  : np.array([self.__meta['gates'][c][0] for c in cols], dtype=str),
+            'gate_qubits': qubits,
+            'gate_time'  : times[cols],
+            'gate_error' : errors[cols]
+        })
+        device = Device()
+        device.setCalibration(calib)
+        return device
+
+    # Return the file name of the field
+    def __File(self, field):
+        return os.path.join(self.__dir, field + '.bin')
+
+    # Return the memory-mapped array of the field: S x width array (or array with length S if width is None)
+    def __Map(self, field, width):
+        count = self.__meta['count']
+        shape = (count,) if (width is None) else (count, width)
+        if((count == 0) or (width == 0)):
+            return np.zeros(shape)
+        return np.memmap(self.__File(field), dtype=np.float64, mode='r', shape=shape)
+
+    # Add the new gates as new columns of the gate fields (NaN for the stored snapshots)
+    def __Widen(self, gates):
+        (count, G) = (self.__meta['count'], len(self.__meta['gates']))
+        for field in GATE_FIELDS:
+            values = np.full((count, G + len(gates)), np.nan)
+            values[:, :G] = self.__Map(field, G)
+            values.tofile(self.__File(field) + '.tmp')
+            os.replace(self.__File(field) + '.tmp', self.__File(field))
+        for key in gates:
+            self.__columns[key] = len(self.__meta['gates'])
+            self.__meta['gates'].append([key[0], list(key[1])])
+        self.__Commit()
+
+    # Write the meta data
+    def __Commit(self):
+        meta = os.path.join(self.__dir, 'meta.json')
+        with open(meta + '.tmp', 'w') as f:
+            json.dump(self.__meta, f)
+        os.replace(meta + '.tmp', meta)
+
+    # Convert the timestamp (datetime or POSIX time) into POSIX time in seconds
+    def __Seconds(self, timestamp):
+        if(isinstance(timestamp, datetime)):
+            return timestamp.timestamp()
+        if(isinstance(timestamp, (int, float, np.integer, np.floating))):
+            return float(timestamp)
+        raise ERROR("timestamp should be a datetime or POSIX time in seconds")
@@ -24,6 +24,92 @@
 #######################################################################################
 from QuAwesome.exceptions import QuAwesomeError as ERROR
 from qiskit_ibm_runtime import IBMBackend
+import numpy as np
+import hashlib
+import json
+import os
+import tempfile
+
+# default directory of the parsed calibration snapshots
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'QuAwesome', 'calibration')
+
+# version of the parsed calibration arrays, which should be increased once the format of the parsed arrays is changed
+PARSE_VERSION = 1
+
+class GateTable:
+    def __init__(self):
+        """
+        Table of gates indexed by (gate name, qubit tuple), where each gate has an integer index (row),
+        and the gate times (with unit 'ns') and errors are stored in arrays (NaN if unknown).
+
+        Functions
+            - set(gate, qubits, time=None, error=None):
+                add (or update) the gate and return its index
+            - index(gate, qubits):
+                return the index of the gate, -1 if it doesn't exist
+            - getTime(gate, qubits):
+                return the gate time, NaN if it doesn't exist
+            - getNames(), getQubits(), getTimes(), getErrors():
+                return the arrays of gate names, qubits (G x k array padded with -1), times, and errors of all gates
+            - select(gate):
+                return the array of index of all gates with the given name
+            - getVersion():
+                return the number of modifications of the table
+        """
+        self.__index   = {} # (gate, qubits) -> row
+        self.__names   = []
+        self.__codes   = {} # gate name -> integer code
+        self.__gates   = np.full(8, -1, dtype=np.int64) # integer code of the gate name of each row
+        self.__qubits  = np.full((8, 2), -1, dtype=np.int64)
+        self.__times   = np.full(8, np.nan)
+        self.__errors  = np.full(8, np.nan)
+        self.__version = 0
+
+    def __len__(self):
+        return len(self.__names)
+
+    def set(self, gate, qubits, time=None, error=None):
+        key = (gate, tuple(qubits))
+        idx = self.__index.get(key, -1)
+        if(idx < 0):
+            idx = len(self.__names)
+            if(idx == len(self.__times)):
+                # grow the arrays
+                self.__gates  = np.concatenate([self.__gates,  np.full(idx, -1, dtype=np.int64)])
+                self.__qubits = np.concatenate([self.__qubits, np.full(self.__qubits.shape, -1, dtype=np.int64)])
+                self.__times  = np.concatenate([self.__times,  np.full(idx, np.nan)])
+                self.__errors = np.concatenate([self.__errors, np.full(idx, np.nan)])
+            if(len(key[1]) > self.__qubits.shape[1]):
+                self.__qubits = np.concatenate([self.__qubits, np.full((len(self.__qubits), len(key[1]) - self.__qubits.shape[1]), -1, dtype=np.int64)], axis=1)
+            self.__index[key] = idx
+            self.__names.append(gate)
+            self.__gates[idx] = self.__codes.setdefault(gate, len(self.__codes))
+            self.__qubits[idx, :len(key[1])] = key[1]
+
+        if(time is not None):  self.__times[idx]  = time
+        if(error is not None): self.__errors[idx] = error
+        self.__version += 1
+        return idx
+
+    def index(self, gate, qubits): return self.__index.get((gate, tuple(qubits)), -1)
+
+    def getTime(self, gate, qubits):
+        idx = self.__index.get((gate, tuple(qubits)), -1)
+        return self.__times[idx] if (idx >= 0) else np.nan
+
+    def getNames(self):  return np.array(self.__names, dtype=str)
+
+    def getQubits(self): return self.__qubits[:len(self.__names)]
+
+    def getTimes(self):  return self.__times[:len(self.__names)]
+
+    def getErrors(self): return self.__errors[:len(self.__names)]
+
+    def select(self, gate):
+        if(gate not in self.__codes): return np.zeros(0, dtype=np.int64)
+        return np.nonzero(self.__gates[:len(self.__names)] == self.__codes[gate])[0]
+
+    def getVersion(self): return self.__version
 
 class Device:
     # constructor
@@ -35,6 +121,18 @@ class Device:
             -setIBMQBackend(backend):
                 set IBMQ backend as the device
 
+            - loadCalibration(source, cacheDir=CACHE_DIR):
+                set the device from a calibration snapshot: a JSON file of backend properties (e.g. props_*.json),
+                a dict of backend properties, or an (offline fake) backend with properties(). The parsed arrays are
+                cached on disk (cacheDir, or None to disable) by the fingerprint of the snapshot
+
+            - getCalibration():
+                return a dictionary of the calibration arrays (T1, T2, Gamma1, Gamma2, readout error, and
+                the name, qubits, time, and error of each gate), None if no snapshot is loaded
+
+            - setCalibration(calib):
+                set the device from a dictionary of calibration arrays (in the format of getCalibration())
+
             - getN():
                 return qubit number
 
@@ -56,6 +154,16 @@ class Device:
             - getGateError():
                 return a dictionary of gate errors
 
+            - getGateTable():
+                return the GateTable of all gates, indexed by (gate name, qubit tuple)
+
+            - getCoupling():
+                return the N x N boolean adjacency matrix of the coupling graph (from the 'cx' gates), where
+                [control, target] is True if the 'cx' gate exists
+
+            - getNeighbors(qubit):
+                return the sorted array of qubits coupled with the given one (in either direction)
+
             - to_dict():
                 return a dictionary contains all content
 
@@ -72,6 +180,9 @@ class Device:
         self.__Gamma1      = []
         self.__Gamma2      = []
         self.__Name        = ''
+        self.__Calibration = None
+        self.__Table       = GateTable()
+        self.__Index       = {} # cached structures built from the gate table: name -> (version, value)
 
     # set IBMQ backend Info.
     def setIBMQBackend(self, backend):
@@ -79,60 +190,61 @@ class Device:
         if(not isinstance(backend, IBMBackend)):
             raise ERROR("given backend is not a legal IBMQ real device")
         
-        self.__N           = 0
-        self.__QubitConfig = []
-        self.__GateTime    = {}
-        self.__GateError   = {}
-        self.__Gamma1      = []
-        self.__Gamma2      = []
-        self.__Name        = backend.name
-        Property = backend.properties()
+        self.__SetCalibration(self.__Parse(backend.name, backend.properties().to_dict()))
+
+    # set Info. from a calibration snapshot
+    def loadCalibration(self, source, cacheDir=CACHE_DIR):
+        # read the snapshot (and its fingerprint) from a file, a dict, or a backend
+        if(isinstance(source, str)):
+            with open(source, 'rb') as f:
+                raw = f.read()
+            (name, props) = (None, raw)
+        elif(isinstance(source, dict)):
+            raw = json.dumps(source, sort_keys=True, default=str).encode()
+            (name, props) = (None, source)
+        elif(hasattr(source, 'properties')):
+            # the offline fake backends keep the snapshot in a JSON file, which is hashed without parsing it
+            path = os.path.join(getattr(source, 'dirname', ''), getattr(source, 'props_filename', ''))
+            if(os.path.isfile(path)):
+                with open(path, 'rb') as f:
+                    raw = f.read()
+                (name, props) = (source.name, None)
+            else:
+                props = source.properties().to_dict()
+                raw   = json.dumps(props, sort_keys=True, default=str).encode()
+                name  = source.name
+        else:
+            raise ERROR("source should be a file name, a dict of backend properties, or a backend")
 
-        # Read Qubit config info. and set Gamma1, Gamma2
-        for qubit in Property.qubits:
-            # Read Qubit config info.
-            config = {}
-            for nduv in qubit:
-                # Change time unit into 'ns'
-                if(nduv.unit == 'ms'):
-                    config[nduv.name] = nduv.value * 1000000
-                elif(nduv.unit == 'us'):
-                    config[nduv.name] = nduv.value * 1000
-                elif(nduv.unit == 'ns') or (nduv.unit == ''):
-                    config[nduv.name] = nduv.value
-                else:
-                    config[nduv.name] = [nduv.value, nduv.unit]
-            
-            self.__N = self.__N + 1
-            self.__QubitConfig.append(config)
-
-            # set Gamma1 and Gamma2
-            self.__Gamma1.append(1 / config['T1'])
-            self.__Gamma2.append(0.5 * (1 / config['T2'] + 0.5 / config['T1']))
+        # the fingerprint includes the version of the parsed arrays, so the cached arrays of an older format are not loaded
+        fingerprint = hashlib.sha256(('v' + str(PARSE_VERSION) + ':').encode() + raw).hexdigest()
 
-        # Read Gate Error and Gate time info.
-        for gate in Property.gates:
-            
-            # set key value (gate name + qubit index)
-            idx = gate.gate
-            if idx != 'reset':
-                for q in gate.qubits:
-                    idx += ('_' + str(q))
-
-                nduv_E, nduv_T = gate.parameters
-
-                # Gate Error
-                self.__GateError[idx] = nduv_E.value
-
-                # Gate Time and change time unit into 'ns'
-                if(nduv_T.unit == 'ms'):
-                    self.__GateTime[idx] = nduv_T.value * 1000000
-                elif(nduv_T.unit == 'us'):
-                    self.__GateTime[idx] = nduv_T.value * 1000
-                elif(nduv_T.unit == 'ns'):
-                    self.__GateTime[idx] = nduv_T.value
-                else:
-                    raise ERROR("unknown unit for gate time " + idx)
+        # load the parsed arrays from the cache, or parse the snapshot and store it
+        cache = None if (cacheDir is None) else os.path.join(cacheDir, fingerprint + '.npz')
+        if((cache is not None) and os.path.isfile(cache)):
+            with np.load(cache, allow_pickle=False) as data:
+                calib = {key: data[key] for key in data.files}
+        else:
+            if(props is None):
+                props = source.properties().to_dict()
+            elif(isinstance(props, bytes)):
+                props = json.loads(props)
+            calib = self.__Parse(props.get('backend_name', ''), props)
+            if(cache is not None):
+                # each writer saves into its own temporary file, which is then moved onto the cache atomically
+                os.makedirs(cacheDir, exist_ok=True)
+                (fd, tmp) = tempfile.mkstemp(dir=cacheDir, suffix='.npz')
+                try:
+                    with os.fdopen(fd, 'wb') as f:
+                        np.savez(f, **calib)
+                    os.replace(tmp, cache)
+                except BaseException:
+                    os.remove(tmp)
+                    raise
+
+        calib['fingerprint'] = np.array(fingerprint)
+        if(name is not None): calib['name'] = np.array(name)
+        self.__SetCalibration(calib)
 
     def getN(self): return self.__N
 
@@ -148,15 +260,34 @@ class Device:
 
     def getGateError(self): return self.__GateError
 
+    def getCalibration(self): return self.__Calibration
+
+    def setCalibration(self, calib):
+        # check if the input of calib is legal
+        keys = ['name', 'T1', 'T2', 'Gamma1', 'Gamma2', 'readout_error', 'gate_name', 'gate_qubits', 'gate_time', 'gate_error']
+        if((not isinstance(calib, dict)) or any([key not in calib for key in keys])):
+            raise ERROR("calib should be a dictionary with keys: " + ', '.join(keys))
+
+        calib = {key: np.asarray(value) for (key, value) in calib.items()}
+        if(len(calib['T1']) == 0): raise ERROR("calib should contain at least 1 qubit")
+        if('config' not in calib):
+            # qubit config from the known T1, T2, and readout error
+            configs = [{name: float(calib[name][n]) for name in ['T1', 'T2', 'readout_error'] if np.isfinite(calib[name][n])}
+                       for n in range(len(calib['T1']))]
+            calib['config'] = np.array(json.dumps(configs))
+        self.__SetCalibration(calib)
+
     def getGateInfo(self):
-        info = {}
-        for key in self.__GateTime.keys():
-            gate = {
-                'time' : self.__GateTime[key],
-                'error': self.__GateError[key]
-            }
-            info[key] = gate
-        return info
+        return self.__Cached('info', self.__BuildGateInfo)
+
+    def getGateTable(self): return self.__Table
+
+    def getCoupling(self):
+        return self.__Cached('coupling', self.__BuildCoupling)
+
+    def getNeighbors(self, qubit):
+        self.__isLegal(qubit)
+        return self.__Cached('neighbors', self.__BuildNeighbors)[qubit]
 
     def to_dict(self):
         return {
@@ -203,11 +334,113 @@ class Device:
                 self.__isLegal(q[1])
                 
                 self.__GateTime[gateName + str(q[0]) + "_" + str(q[1])] = time
+                self.__Table.set(gateName, q, time=time)
 
             # if gate name isn't 'cx'
             else:
                 self.__GateTime[gateName + "_" + str(q)] = time
+                self.__Table.set(gateName, (q,), time=time)
     
+    # Parse the backend properties (in the format of BackendProperties.to_dict()) into arrays, with time unit 'ns'
+    def __Parse(self, name, props):
+        # Read Qubit config info.
+        configs = []
+        for qubit in props['qubits']:
+            config = {}
+            for nduv in qubit:
+                value = self.__Convert(nduv['value'], nduv['unit'])
+                config[nduv['name']] = value if (value is not None) else [nduv['value'], nduv['unit']]
+            configs.append(config)
+
+        # Read Gate Error and Gate time info.
+        gates = [gate for gate in props['gates'] if gate['gate'] != 'reset']
+        (gate_time, gate_error) = (np.full(len(gates), np.nan), np.full(len(gates), np.nan))
+        gate_qubits = np.full((len(gates), max([len(gate['qubits']) for gate in gates] + [1])), -1, dtype=np.int64)
+        for (g, gate) in enumerate(gates):
+            gate_qubits[g, :len(gate['qubits'])] = gate['qubits']
+            for nduv in gate['parameters']:
+                if(nduv['name'] == 'gate_error'):
+                    gate_error[g] = nduv['value']
+                elif(nduv['name'] == 'gate_length'):
+                    time = self.__Convert(nduv['value'], nduv['unit'])
+                    if(time is None): raise ERROR("unknown unit for gate time " + gate['gate'])
+                    gate_time[g] = time
+
+        T1 = np.array([config['T1'] for config in configs], dtype=float)
+        T2 = np.array([config['T2'] for config in configs], dtype=float)
+        return {
+            'name'         : np.array(name),
+            'config'       : np.array(json.dumps(configs, default=str)),
+            'T1'           : T1,
+            'T2'           : T2,
+            'Gamma1'       : 1 / T1,
+            'Gamma2'       : 0.5 * (1 / T2 + 0.5 / T1),
+            'readout_error': np.array([config.get('readout_error', np.nan) for config in configs], dtype=float),
+            'gate_name'    : np.array([gate['gate'] for gate in gates], dtype=str),
+            'gate_qubits'  : gate_qubits,
+            'gate_time'    : gate_time,
+            'gate_error'   : gate_error
+        }
+
+    # Set Info. from the calibration arrays
+    def __SetCalibration(self, calib):
+        self.__Calibration = calib
+        self.__Name        = str(calib['name'])
+        self.__N           = len(calib['T1'])
+        self.__QubitConfig = json.loads(str(calib['config']))
+        self.__Gamma1      = calib['Gamma1'].tolist()
+        self.__Gamma2      = calib['Gamma2'].tolist()
+
+        # set key value (gate name + qubit index)
+        self.__GateTime  = {}
+        self.__GateError = {}
+        self.__Table     = GateTable()
+        self.__Index     = {} # the cached structures belong to the old table
+        for (g, name) in enumerate(calib['gate_name']):
+            qubits = tuple([int(q) for q in calib['gate_qubits'][g] if q >= 0])
+            idx    = str(name) + ''.join(['_' + str(q) for q in qubits])
+            self.__GateTime[idx]  = float(calib['gate_time'][g])
+            self.__GateError[idx] = float(calib['gate_error'][g])
+            self.__Table.set(str(name), qubits, calib['gate_time'][g], calib['gate_error'][g])
+
+    # Return the cached structure built from the gate table, which is rebuilt after the table is modified
+    def __Cached(self, name, build):
+        version = self.__Table.getVersion()
+        if((name not in self.__Index) or (self.__Index[name][0] != version)):
+            self.__Index[name] = (version, build())
+        return self.__Index[name][1]
+
+    def __BuildGateInfo(self):
+        info = {}
+        for key in self.__GateTime.keys():
+            gate = {
+                'time' : self.__GateTime[key],
+                'error': self.__GateError.get(key)
+            }
+            info[key] = gate
+        return info
+
+    def __BuildCoupling(self):
+        adjacency = np.zeros((self.__N, self.__N), dtype=bool)
+        qubits    = self.__Table.getQubits()[self.__Table.select('cx')]
+        adjacency[qubits[:, 0], qubits[:, 1]] = True
+        return adjacency
+
+    def __BuildNeighbors(self):
+        adjacency = self.getCoupling()
+        adjacency = adjacency | adjacency.T
+        return [np.nonzero(adjacency[q])[0] for q in range(self.__N)]
+
+    # Change time unit into 'ns' (None for the other units)
+    def __Convert(self, value, unit):
+        if(unit == 'ms'):
+            return value * 1000000
+        elif(unit == 'us'):
+            return value * 1000
+        elif(unit == 'ns') or (unit == ''):
+            return value
+        return None
+
     # Check if the qubit is legal
     def __isLegal(self, qubit):
         if(not isinstance(qubit, int) or (qubit < 0) or (qubit >= self.__N)):
@@ -0,0 +1,87 @@
+# This code is part of QuAwesome.
+#
+#    MIT License
+#
+#    Copyright (c) 2020 and later, Yi-Te Huang
+#
+#    Permission is hereby granted, free of charge, to any person obtaining a copy
+#    of this software and associated documentation files (the "Software"), to deal
+#    in the Software without restriction, including without limitation the rights
+#    to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#    copies of the Software, and to permit persons to whom the Software is
+#    furnished to do so, subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be included in all
+#    copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#    IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#    FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#    LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#    OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#    SOFTWARE.
+#######################################################################################
+from QuAwesome import Device
+from QuAwesome import QuAwesomeError as ERROR
+from QuAwesome.QuantumNoiseSimulator.QuantumNoiseSimulator import QuantumNoiseSimulator
+from QuAwesome.QuantumNoiseSimulator.PrefixCache import PrefixCache
+import numpy as np
+
+def generateAssemblage(device, Q_min, Q_max, prepare, settings, trusted, prefixCache=None, **options):
+    """
+    Return the assemblage (M x A x N x N array) of the simulated state, where each member sigma_a|x is
+    the unnormalized state of the trusted qubits when the other (untrusted) qubits are measured with setting x
+    and give outcome a. The preparation is simulated once (for each device), and each setting resumes from it
+    through the prefix cache. The output can be given to the functions of Steering, WorkExtraction, etc. \n
+    Inputs:
+        device      - a QuAwesome.Device, or a list of Device (e.g. a sweep over noise levels)
+        Q_min       - the smallest qubit index of the simulator, or the list of qubit index of the simulator
+        Q_max       - the largest qubit index of the simulator (None for the list of qubit index)
+        prepare     - function prepare(simulator) which applies the gates of the state preparation
+        settings    - list of M functions setting(simulator), each one applies the basis rotation of the measurement x
+                      on the untrusted qubits, which are then measured in the computational basis, and the A = 2^k outcomes
+                      are ordered as the keys of measure() (the first bit is the smallest untrusted qubit index)
+        trusted     - list of the trusted qubit index (N = 2^n), the matrices are given in the logical basis
+                      |0...0>, ..., |1...1> of them (the first bit is the smallest trusted qubit index)
+        prefixCache - [Default as None: a new PrefixCache] the PrefixCache storing the prepared states
+        options     - other options of QuantumNoiseSimulator (noise, precision, ...)
+    Output:
+        M x A x N x N array, or an array of them (D x M x A x N x N) for the list of D devices
+    """
+    if(isinstance(device, list)):
+        return np.array([generateAssemblage(d, Q_min, Q_max, prepare, settings, trusted, prefixCache, **options) for d in device])
+
+    if(not isinstance(device, Device)):
+        raise ERROR("The device should be an QuAwesome.Device type object, or a list of them")
+    qubits = sorted(Q_min) if isinstance(Q_min, list) else list(range(Q_min, Q_max + 1))
+    if(not isinstance(trusted, list) or (len(set(trusted)) != len(trusted)) or any([q not in qubits for q in trusted])):
+        raise ERROR("trusted should be a list of different qubit index of the simulator " + str(qubits))
+    if(not isinstance(settings, list) or (len(settings) == 0)):
+        raise ERROR("settings should be a non-empty list of functions")
+    if('batch' in options):
+        raise ERROR("batch mode is not supported by generateAssemblage")
+
+    n         = len(qubits)
+    trusted   = sorted([qubits.index(q) for q in trusted])
+    untrusted = [q for q in range(n) if q not in trusted]
+    cache     = PrefixCache() if (prefixCache is None) else prefixCache
+
+    assemblage = []
+    for setting in settings:
+        # the preparation is stored in the cache by run(), and resumed by the following settings
+        simulator = QuantumNoiseSimulator(Q_min, Q_max, device, prefixCache=cache, **options)
+        prepare(simulator)
+        simulator.run()
+        setting(simulator)
+
+        # rank-2n tensor of the state in the logical basis (flipping all of the bits of the index in the basis of qutip)
+        rho = simulator.getState().full()[::-1, ::-1]
+        rho = np.reshape(rho, [2] * (2 * n))
+
+        # project the untrusted qubits onto each outcome
+        rho = np.transpose(rho, untrusted + [n + q for q in untrusted] + trusted + [n + q for q in trusted])
+        rho = np.reshape(rho, (2 ** len(untrusted), 2 ** len(untrusted), 2 ** len(trusted), 2 ** len(trusted)))
+        assemblage.append(np.array([rho[a, a] for a in range(rho.shape[0])]))
+
+    return np.array(assemblage)
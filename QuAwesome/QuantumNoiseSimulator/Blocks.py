@@ -0,0 +1,163 @@
+# This code is part of QuAwesome.
+#
+#    MIT License
+#
+#    Copyright (c) 2020 and later, Yi-Te Huang
+#
+#    Permission is hereby granted, free of charge, to any person obtaining a copy
+#    of this software and associated documentation files (the "Software"), to deal
+#    in the Software without restriction, including without limitation the rights
+#    to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#    copies of the Software, and to permit persons to whom the Software is
+#    furnished to do so, subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be included in all
+#    copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#    IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#    FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#    LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#    OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#    SOFTWARE.
+#######################################################################################
+from QuAwesome import QuAwesomeError as ERROR
+from QuAwesome.QuantumNoiseSimulator.Kernel import applyGate, applyChannel
+from QuAwesome.QuantumNoiseSimulator import Measurement, Pauli
+import numpy as np
+
+class ProductState:
+    def __init__(self, N, B=1, dtype=complex):
+        """
+        Density matrices of N qubits stored as a product of independent blocks, where each block is a group of qubits
+        with its own (B x 2^n x 2^n) density matrices. Two blocks are merged only when a gate couples them, so that the
+        cost is the sum of the block sizes instead of 4^N as long as the qubits stay unentangled.
+        The initial state is |0...0><0...0| with basis(2,1) as |0>, where each qubit is a block.
+
+        Inputs:
+            N     - total qubit number
+            B     - [Default as 1] batch size
+            dtype - [Default as complex] data type of the density matrices
+
+        Functions
+            - getBlocks():
+                return list of (qubits, rho) for each block, with the (internal) qubit index ordered as the tensor product of rho
+            - applyGate(U, qubits):
+                apply the gate U on the given qubits, the blocks containing these qubits are merged if needed
+            - applyChannel(kraus_list, qubit):
+                apply a single qubit channel on the given qubit
+            - marginals(subsets):
+                return list of marginal probabilities (B x 2^k arrays) for each sorted list of qubits
+            - expectation(paulis, positions):
+                return B x P array of expectation values of the Pauli strings
+            - full():
+                return the B x 2^N x 2^N density matrices
+            - copy():
+                return a copy of the product state
+        """
+        self.__N      = N
+        self.__blocks = []
+        for n in range(N):
+            rho = np.zeros((B, 2, 2), dtype=dtype)
+            rho[:, 1, 1] = 1.0
+            self.__blocks.append(([n], rho))
+
+    @property
+    def nbytes(self):
+        return sum([rho.nbytes for (qubits, rho) in self.__blocks])
+
+    def getBlocks(self): return self.__blocks
+
+    def copy(self):
+        state = ProductState(0)
+        state.__N      = self.__N
+        state.__blocks = [(list(qubits), rho.copy()) for (qubits, rho) in self.__blocks]
+        return state
+
+    def applyGate(self, U, qubits):
+        (block, rho) = self.__Merge(qubits)
+        local = [block.index(q) for q in qubits]
+        self.__Replace(block, applyGate(rho, U, local, len(block)))
+
+    def applyChannel(self, kraus_list, qubit):
+        (block, rho) = self.__Find(qubit)
+        self.__Replace(block, applyChannel(rho, kraus_list, block.index(qubit), len(block)))
+
+    def marginals(self, subsets):
+        result = []
+        for qubits in subsets:
+            # marginals of each block (in the logical basis), combined by outer product
+            prob  = np.ones((self.__blocks[0][1].shape[0], 1))
+            order = []
+            for (block, rho) in self.__blocks:
+                local = sorted([block.index(q) for q in qubits if q in block])
+                if(len(local) == 0): continue
+                diag  = np.real(np.diagonal(rho, axis1=1, axis2=2))
+                prob  = np.reshape(prob[:, :, None] * Measurement.marginals(diag, [local], len(block))[0][:, None, :], (prob.shape[0], -1))
+                order = order + [block[n] for n in local]
+
+            # reorder the bits into the ascending order of qubits
+            tensor = np.reshape(prob, [prob.shape[0]] + [2] * len(order))
+            tensor = np.transpose(tensor, [0] + [1 + order.index(q) for q in sorted(order)])
+            result.append(np.reshape(tensor, (prob.shape[0], -1)))
+        return result
+
+    def expectation(self, paulis, qubits):
+        # the expectation value of a Pauli string is the product of the ones of its sub-strings on each block
+        for string in paulis:
+            if(not isinstance(string, str) or (len(string) != len(qubits))):
+                raise ERROR("Each Pauli string should be a string with length " + str(len(qubits)))
+        result = np.ones((self.__blocks[0][1].shape[0], len(paulis)))
+        for (block, rho) in self.__blocks:
+            chars = [m for (m, q) in enumerate(qubits) if q in block]
+            if(len(chars) == 0): continue
+            sub       = [''.join([p[m] for m in chars]) for p in paulis]
+            positions = [len(block) - 1 - block.index(qubits[m]) for m in chars]
+            result    = result * Pauli.expectation(self.__Gatherer(rho), sub, positions, len(block))
+        return result
+
+    def full(self):
+        # tensor product of all blocks, then reorder the qubits into the internal order
+        (order, rho) = self.__blocks[0]
+        order = list(order)
+        for (block, r) in self.__blocks[1:]:
+            rho   = self.__Kron(rho, r)
+            order = order + block
+
+        perm   = [order.index(n) for n in range(self.__N)]
+        tensor = np.reshape(rho, [rho.shape[0]] + [2] * (2 * self.__N))
+        tensor = np.transpose(tensor, [0] + [1 + p for p in perm] + [1 + self.__N + p for p in perm])
+        return np.reshape(tensor, rho.shape)
+
+    # Return the block containing the qubit
+    def __Find(self, qubit):
+        for (block, rho) in self.__blocks:
+            if qubit in block: return (block, rho)
+
+    def __Replace(self, block, rho):
+        self.__blocks = [(b, rho if (b is block) else r) for (b, r) in self.__blocks]
+
+    # Merge the blocks containing the given qubits into one block
+    def __Merge(self, qubits):
+        found = []
+        for (block, rho) in self.__blocks:
+            if any([q in block for q in qubits]): found.append((block, rho))
+        if(len(found) == 1): return found[0]
+
+        (block, rho) = (list(found[0][0]), found[0][1])
+        for (b, r) in found[1:]:
+            rho   = self.__Kron(rho, r)
+            block = block + b
+        self.__blocks = [(b, r) for (b, r) in self.__blocks if not any([q in b for q in qubits])] + [(block, rho)]
+        return (block, rho)
+
+    # Tensor product of two batches of density matrices
+    def __Kron(self, rho1, rho2):
+        (B, d1, d2) = (rho1.shape[0], rho1.shape[1], rho2.shape[1])
+        return np.reshape(np.einsum('bij,bkl->bikjl', rho1, rho2), (B, d1 * d2, d1 * d2))
+
+    # Return the function mapping xmasks into rho[k, k ^ xmask] (see Pauli.expectation)
+    def __Gatherer(self, rho):
+        k = np.arange(rho.shape[1])
+        return lambda xmask: rho[:, k[None, :], k[None, :] ^ xmask[:, None]]
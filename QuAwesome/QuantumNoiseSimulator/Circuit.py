@@ -0,0 +1,126 @@
+# This code is part of QuAwesome.
+#
+#    MIT License
+#
+#    Copyright (c) 2020 and later, Yi-Te Huang
+#
+#    Permission is hereby granted, free of charge, to any person obtaining a copy
+#    of this software and associated documentation files (the "Software"), to deal
+#    in the Software without restriction, including without limitation the rights
+#    to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#    copies of the Software, and to permit persons to whom the Software is
+#    furnished to do so, subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be included in all
+#    copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#    IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#    FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#    LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#    OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#    SOFTWARE.
+#######################################################################################
+from QuAwesome.QuantumNoiseSimulator import Gates
+import numpy as np
+
+class Circuit:
+    def __init__(self, ops=None):
+        """
+        A record of gate operations for the deferred (lazy) mode of QuantumNoiseSimulator.
+        Each operation is stored as a tuple: (name, params, qubits, time)
+            name   - gate name ('id', 'u1', 'u2', 'u3', 'cx', 'cu3', or 'unitary')
+            params - tuple of gate parameters
+            qubits - tuple of qubit index, ordered as (control, target) for two qubit gates
+            time   - gate operation time
+
+        Inputs:
+            ops - [Default as None] list of operations to start with
+
+        Functions
+            - append(name, params, qubits, time):
+                record a gate operation
+            - getOperations():
+                return the list of recorded operations
+            - fuse(index=False):
+                return the list of operations where the runs of adjacent single qubit gates on the same qubit are fused
+                (and the list of positions of the recorded operations merged into each one if index is True)
+            - moments(fuse=True, index=False):
+                return the list of moments (layers), each one is a list of operations acting on disjoint qubits
+                (and the list of positions of the recorded operations in each moment if index is True)
+            - clear():
+                remove all of the recorded operations
+        """
+        self.__ops = [] if (ops is None) else list(ops)
+
+    def __len__(self):
+        return len(self.__ops)
+
+    def __iter__(self):
+        return iter(self.__ops)
+
+    def __getitem__(self, idx):
+        return self.__ops[idx]
+
+    def append(self, name, params, qubits, time):
+        self.__ops.append((name, tuple(params), tuple(qubits), time))
+
+    def getOperations(self): return self.__ops
+
+    def clear(self):
+        self.__ops = []
+
+    def fuse(self, index=False):
+        # Single qubit gates are fused as long as no other gate acts on the same qubit in between.
+        # The fused gate is placed at the position of the first gate in the run, and the sum of gate times
+        # is applied as one noise step afterwards.
+        fused   = []
+        sources = [] # positions of the recorded operations merged into each fused one
+        pending = {} # qubit index -> position (in fused) of the open run of single qubit gates
+        for (pos, (name, params, qubits, time)) in enumerate(self.__ops):
+            # multi-qubit gate: close the runs on its qubits
+            if(len(qubits) != 1):
+                for q in qubits: pending.pop(q, None)
+                fused.append((name, params, qubits, time))
+                sources.append([pos])
+
+            # open a new run
+            elif(qubits[0] not in pending):
+                pending[qubits[0]] = len(fused)
+                fused.append((name, params, qubits, time))
+                sources.append([pos])
+
+            # merge into the open run
+            else:
+                idx = pending[qubits[0]]
+                (name0, params0, qubits0, time0) = fused[idx]
+                fused[idx] = ('unitary', (self.__product(name, params, name0, params0),), qubits, time0 + time)
+                sources[idx].append(pos)
+
+        return (fused, sources) if index else fused
+
+    def moments(self, fuse=True, index=False):
+        # pack each operation into the earliest moment after the last operation on any of its qubits
+        (ops, sources) = self.fuse(index=True) if fuse else (self.__ops, [[pos] for pos in range(len(self.__ops))])
+        layers  = []
+        indices = [] # positions of the recorded operations in each moment
+        depth   = {} # qubit index -> number of moments already occupied
+        for (op, source) in zip(ops, sources):
+            l = max([depth.get(q, 0) for q in op[2]])
+            if(l == len(layers)):
+                layers.append([])
+                indices.append([])
+            layers[l].append(op)
+            indices[l] += source
+            for q in op[2]: depth[q] = l + 1
+
+        return (layers, indices) if index else layers
+
+    # matrix of the gate (name1, params1) after the gate (name0, params0)
+    def __product(self, name1, params1, name0, params0):
+        U0 = Gates.matrix(name0, params0)
+        U1 = Gates.matrix(name1, params1)
+        if(U0 is None): U0 = np.eye(2, dtype=complex)
+        if(U1 is None): U1 = np.eye(2, dtype=complex)
+        return U1 @ U0
@@ -0,0 +1,106 @@
+# This code is part of QuAwesome.
+#
+#    MIT License
+#
+#    Copyright (c) 2020 and later, Yi-Te Huang
+#
+#    Permission is hereby granted, free of charge, to any person obtaining a copy
+#    of this software and associated documentation files (the "Software"), to deal
+#    in the Software without restriction, including without limitation the rights
+#    to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#    copies of the Software, and to permit persons to whom the Software is
+#    furnished to do so, subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be included in all
+#    copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#    IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#    FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#    LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#    OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#    SOFTWARE.
+#######################################################################################
+from QuAwesome import QuAwesomeError as ERROR
+import numpy as np
+
+# Matrices of the native gates, in the basis of qutip: basis(2,1) as |0> and basis(2,0) as |1>
+# Two qubit gates are ordered as (control, target)
+
+# projectors
+UP   = np.array([[1, 0], [0, 0]], dtype=complex) # basis(2,0) * basis(2,0).dag()
+DOWN = np.array([[0, 0], [0, 1]], dtype=complex) # basis(2,1) * basis(2,1).dag()
+SX   = np.array([[0, 1], [1, 0]], dtype=complex)
+
+# The parameters can be numbers or arrays (for batch), in the later case the matrices are stacked along the leading axes
+def u1(lamb):
+    lamb = np.asarray(lamb, dtype=float)
+    U = np.zeros(lamb.shape + (2, 2), dtype=complex)
+    U[..., 0, 0] = np.exp(1.0j * lamb)
+    U[..., 1, 1] = 1
+    return U
+
+def u2(phi, lamb):
+    (phi, lamb) = np.broadcast_arrays(np.asarray(phi, dtype=float), np.asarray(lamb, dtype=float))
+    U = np.zeros(phi.shape + (2, 2), dtype=complex)
+    U[..., 0, 0] = np.sqrt(0.5) * np.exp(1.0j * (phi + lamb))
+    U[..., 0, 1] = np.sqrt(0.5) * np.exp(1.0j * phi)
+    U[..., 1, 0] = - np.sqrt(0.5) * np.exp(1.0j * lamb)
+    U[..., 1, 1] = np.sqrt(0.5)
+    return U
+
+def u3(theta, phi, lamb):
+    (theta, phi, lamb) = np.broadcast_arrays(np.asarray(theta, dtype=float), np.asarray(phi, dtype=float), np.asarray(lamb, dtype=float))
+    U = np.zeros(theta.shape + (2, 2), dtype=complex)
+    U[..., 0, 0] = np.exp(1.0j * (phi + lamb)) * np.cos(theta / 2.)
+    U[..., 0, 1] = np.exp(1.0j * phi) * np.sin(theta / 2.)
+    U[..., 1, 0] = - np.exp(1.0j * lamb) * np.sin(theta / 2.)
+    U[..., 1, 1] = np.cos(theta / 2.)
+    return U
+
+def cx():
+    return np.kron(DOWN, np.eye(2)) + np.kron(UP, SX)
+
+def cu3(theta, phi, lamb):
+    # |0><0| (x) I + |1><1| (x) u3, where |1> is basis(2,0)
+    U3 = u3(theta, phi, lamb)
+    U  = np.zeros(U3.shape[:-2] + (4, 4), dtype=complex)
+    U[..., 0:2, 0:2] = U3
+    U[..., 2:4, 2:4] = np.eye(2)
+    return U
+
+def matrix(name, params):
+    """
+    Return the matrix of the gate with given name and parameters (None for the identity gate 'id') \n
+    Inputs:
+        name   - gate name: 'id', 'u1', 'u2', 'u3', 'cx', 'cu3', or 'unitary' (params = (matrix,))
+        params - tuple of gate parameters
+    """
+    if(name == 'id'):      return None
+    if(name == 'unitary'): return params[0]
+    if(name == 'u1'):      return u1(*params)
+    if(name == 'u2'):      return u2(*params)
+    if(name == 'u3'):      return u3(*params)
+    if(name == 'cx'):      return cx()
+    if(name == 'cu3'):     return cu3(*params)
+    raise ERROR("Unknown gate '" + str(name) + "'")
+
+def shiftRule(name, p):
+    """
+    Return the parameter-shift rule of the p-th parameter of the gate, as a list of (shift, coefficient), such that
+    the derivative of any expectation value f is sum(coefficient * f(parameter + shift)) \n
+    Inputs:
+        name - gate name: 'u1', 'u2', 'u3', or 'cu3'
+        p    - index of the parameter
+    """
+    if(name not in ['u1', 'u2', 'u3', 'cu3']): raise ERROR("Gate '" + str(name) + "' has no differentiable parameters")
+
+    # theta of cu3 is a controlled rotation (frequencies 1/2 and 1 in theta), which needs the four-term rule
+    if((name == 'cu3') and (p == 0)):
+        d1 = (np.sqrt(2) + 1) / (4 * np.sqrt(2))
+        d2 = (np.sqrt(2) - 1) / (4 * np.sqrt(2))
+        return [(np.pi / 2, d1), (- np.pi / 2, - d1), (3 * np.pi / 2, - d2), (- 3 * np.pi / 2, d2)]
+
+    # the others are rotations (or phases) with frequency 1
+    return [(np.pi / 2, 0.5), (- np.pi / 2, - 0.5)]
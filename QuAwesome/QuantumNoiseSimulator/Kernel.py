@@ -0,0 +1,104 @@
+# This code is part of QuAwesome.
+#
+#    MIT License
+#
+#    Copyright (c) 2020 and later, Yi-Te Huang
+#
+#    Permission is hereby granted, free of charge, to any person obtaining a copy
+#    of this software and associated documentation files (the "Software"), to deal
+#    in the Software without restriction, including without limitation the rights
+#    to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#    copies of the Software, and to permit persons to whom the Software is
+#    furnished to do so, subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be included in all
+#    copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#    IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#    FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#    LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#    OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#    SOFTWARE.
+#######################################################################################
+import numpy as np
+
+# Kernels acting on the density matrices of N qubits with a leading batch axis: shape (B, 2^N, 2^N).
+# Each density matrix is reshaped into a rank-2N tensor, the first N axes are the row (ket) indices and
+# the last N axes are the column (bra) indices, both ordered in the same way as qutip.tensor
+# (the first qubit is the most significant one).
+# The gates and Kraus operators are cast into the data type of the states (complex128 or complex64).
+
+def applyChannel(rho, kraus_list, qubit, N):
+    """
+    Apply a single qubit channel, given by its 2 x 2 Kraus operators, on the density matrices \n
+    Inputs:
+        rho        - B x 2^N x 2^N density matrices (ndarray)
+        kraus_list - list of 2 x 2 Kraus operators
+        qubit      - the (internal) index of qubit, from 0 to N - 1
+        N          - total qubit number
+    """
+    # local superoperator: S[(a, b), (c, d)] = sum_k K[a, c] * conj(K[b, d])
+    S = sum([np.kron(K, np.conj(K)) for K in kraus_list]).astype(rho.dtype, copy=False)
+
+    # move the row and column axes of the qubit to the front, and apply S on them
+    tensor = np.reshape(rho, [rho.shape[0]] + [2] * (2 * N))
+    tensor = np.moveaxis(tensor, [1 + qubit, 1 + N + qubit], [1, 2])
+    shape  = tensor.shape
+    tensor = S @ np.reshape(tensor, (shape[0], 4, -1))
+    tensor = np.moveaxis(np.reshape(tensor, shape), [1, 2], [1 + qubit, 1 + N + qubit])
+
+    return np.reshape(tensor, rho.shape)
+
+def applyGate(rho, U, qubits, N):
+    """
+    Apply the gate U (acting on k qubits) on the density matrices: U * rho * U^dag,
+    without building the 2^N x 2^N operator \n
+    Inputs:
+        rho    - B x 2^N x 2^N density matrices (ndarray)
+        U      - 2^k x 2^k matrix of the gate, or B x 2^k x 2^k matrices for each member of the batch
+        qubits - list of (internal) qubit index which the gate acts on, ordered as the tensor product of U
+        N      - total qubit number
+    """
+    U    = U.astype(rho.dtype, copy=False)
+    k    = len(qubits)
+    rows = [1 + q for q in qubits]
+    cols = [1 + N + q for q in qubits]
+
+    tensor = np.reshape(rho, [rho.shape[0]] + [2] * (2 * N))
+
+    # U * rho: move the row axes of the qubits to the front
+    tensor = np.moveaxis(tensor, rows, list(range(1, 1 + k)))
+    shape  = tensor.shape
+    tensor = U @ np.reshape(tensor, (shape[0], 2 ** k, -1))
+    tensor = np.moveaxis(np.reshape(tensor, shape), list(range(1, 1 + k)), rows)
+
+    # (U * rho) * U^dag: move the column axes of the qubits to the end
+    tensor = np.moveaxis(tensor, cols, list(range(2 * N + 1 - k, 2 * N + 1)))
+    shape  = tensor.shape
+    tensor = np.reshape(tensor, (shape[0], -1, 2 ** k)) @ np.conj(np.swapaxes(U, -1, -2))
+    tensor = np.moveaxis(np.reshape(tensor, shape), list(range(2 * N + 1 - k, 2 * N + 1)), cols)
+
+    return np.reshape(tensor, rho.shape)
+
+def applyGateVector(psi, U, qubits, N):
+    """
+    Apply the gate U (acting on k qubits) on the state vectors: U * psi \n
+    Inputs:
+        psi    - B x 2^N state vectors (ndarray)
+        U      - 2^k x 2^k matrix of the gate, or B x 2^k x 2^k matrices for each member of the batch
+        qubits - list of (internal) qubit index which the gate acts on, ordered as the tensor product of U
+        N      - total qubit number
+    """
+    U    = U.astype(psi.dtype, copy=False)
+    k    = len(qubits)
+    axes = [1 + q for q in qubits]
+
+    tensor = np.reshape(psi, [psi.shape[0]] + [2] * N)
+    tensor = np.moveaxis(tensor, axes, list(range(1, 1 + k)))
+    shape  = tensor.shape
+    tensor = U @ np.reshape(tensor, (shape[0], 2 ** k, -1))
+    tensor = np.moveaxis(np.reshape(tensor, shape), list(range(1, 1 + k)), axes)
+
+    return np.reshape(tensor, psi.shape)
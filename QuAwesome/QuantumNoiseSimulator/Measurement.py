@@ -0,0 +1,68 @@
+# This code is part of QuAwesome.
+#
+#    MIT License
+#
+#    Copyright (c) 2020 and later, Yi-Te Huang
+#
+#    Permission is hereby granted, free of charge, to any person obtaining a copy
+#    of this software and associated documentation files (the "Software"), to deal
+#    in the Software without restriction, including without limitation the rights
+#    to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#    copies of the Software, and to permit persons to whom the Software is
+#    furnished to do so, subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be included in all
+#    copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#    IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#    FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#    LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#    OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#    SOFTWARE.
+#######################################################################################
+from functools import lru_cache
+import numpy as np
+
+# Measurement in the computational basis, using only the diagonal (populations) of the states.
+# The populations are stored in the basis of qutip, where basis(2,1) is |0>, so that reversing the
+# populations (flipping all of the bits of the index) gives the populations in the logical basis.
+
+@lru_cache(maxsize=None)
+def bitstrings(k):
+    """
+    Return the list of k-bit binary strings, ordered from '0...0' to '1...1'
+    """
+    return [('{:0' + str(k) + 'b}').format(j) for j in range(2 ** k)]
+
+def marginals(diag, subsets, N):
+    """
+    Return the list of marginal probabilities for each subset of qubits, where each one is a B x 2^k array
+    indexed by the k-bit binary number (the first bit is the smallest qubit index in the subset) \n
+    Inputs:
+        diag    - B x 2^N populations (diagonal of the density matrices in the basis of qutip)
+        subsets - list of sorted lists of (internal) qubit index
+        N       - total qubit number
+    """
+    # populations in the logical basis, reshaped into a rank-(N + 1) tensor
+    prob = np.reshape(diag[:, ::-1], [diag.shape[0]] + [2] * N)
+
+    result = []
+    for qubits in subsets:
+        other = tuple([1 + n for n in range(N) if n not in qubits])
+        result.append(np.reshape(np.sum(prob, axis=other), (diag.shape[0], -1)))
+    return result
+
+def sample(prob, shots, rng):
+    """
+    Return B x 2^k array of counts from multinomial sampling \n
+    Inputs:
+        prob  - B x 2^k probabilities
+        shots - number of shots
+        rng   - numpy random generator
+    """
+    # remove the tiny negative values and the deviation of normalization from numerical errors
+    prob = np.clip(prob, 0.0, None)
+    prob = prob / np.sum(prob, axis=1, keepdims=True)
+    return rng.multinomial(shots, prob)
@@ -0,0 +1,195 @@
+# This code is part of QuAwesome.
+#
+#    MIT License
+#
+#    Copyright (c) 2020 and later, Yi-Te Huang
+#
+#    Permission is hereby granted, free of charge, to any person obtaining a copy
+#    of this software and associated documentation files (the "Software"), to deal
+#    in the Software without restriction, including without limitation the rights
+#    to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#    copies of the Software, and to permit persons to whom the Software is
+#    furnished to do so, subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be included in all
+#    copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#    IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#    FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#    LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#    OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#    SOFTWARE.
+#######################################################################################
+from QuAwesome import QuAwesomeError as ERROR
+from QuAwesome.QuantumNoiseSimulator.Kernel import applyChannel
+from QuAwesome.QuantumNoiseSimulator import Sparse, OutOfCore
+from QuAwesome.QuantumNoiseSimulator.Blocks import ProductState
+from collections import OrderedDict
+import numpy as np
+from scipy.linalg import expm
+from scipy.sparse import issparse, csr_matrix
+from qutip import liouvillian
+
+class LindbladPropagator:
+    def __init__(self, H, c_op_list, cacheSize=16, dtype=complex):
+        """
+        Propagator engine for the time-independent Lindblad Master Equation.
+        The propagator exp(L * t) is computed once for each distinct gate time and kept in a bounded (LRU) cache,
+        so that applying the noise of a gate only costs one matrix-vector product on the vectorized density matrix.
+
+        Inputs:
+            H         - the (time-independent) Hamiltonian as a Qobj
+            c_op_list - list of collapse operators (Qobj)
+            cacheSize - [Default as 16] maximum number of propagators stored in the cache
+            dtype     - [Default as complex] data type of the stored propagators (complex128 or complex64)
+
+        Functions
+            - getPropagator(time):
+                return the propagator exp(L * time) as a 2-D array
+            - evolve(rho, time):
+                return the density matrices (B x 2^N x 2^N array) after evolving rho for the given time
+            - clearCache():
+                remove all of the stored propagators
+        """
+        if(not isinstance(cacheSize, int) or (cacheSize <= 0)): raise ERROR("cacheSize should be a positive integer")
+
+        self.__L         = liouvillian(H, c_op_list).full()
+        self.__dtype     = dtype
+        self.__cacheSize = cacheSize
+        self.__cache     = OrderedDict()
+
+    def getPropagator(self, time):
+        key = float(time)
+
+        # cache hit: mark as the most recently used one
+        if key in self.__cache:
+            self.__cache.move_to_end(key)
+            return self.__cache[key]
+
+        # cache miss: compute the propagator and drop the least recently used one if needed
+        propagator = expm(self.__L * key).astype(self.__dtype)
+        self.__cache[key] = propagator
+        if len(self.__cache) > self.__cacheSize:
+            self.__cache.popitem(last=False)
+
+        return propagator
+
+    def evolve(self, rho, time):
+        # the vectorization (column-stacking) follows the convention of qutip
+        (B, dim, _) = rho.shape
+        vec = np.reshape(np.swapaxes(rho, -1, -2), (B, dim * dim))
+        vec = vec @ self.getPropagator(time).T
+        return np.swapaxes(np.reshape(vec, (B, dim, dim)), -1, -2)
+
+    def clearCache(self):
+        self.__cache.clear()
+
+
+class KrausNoise:
+    def __init__(self, Gamma1, Gamma2):
+        """
+        Noise engine for the local T1 / T2 decay of each qubit.
+        Since all of the collapse operators act on single qubit, the Lindblad Master Equation can be solved in closed form,
+        that is, the amplitude damping and dephasing channels of each qubit, applied as 2 x 2 Kraus maps
+        on the reshaped density matrix. The cost is linear in qubit number for each gate.
+
+        Inputs:
+            Gamma1 - list of Gamma1 (for collapse operators sqrt(Gamma1) * sigma_+)
+            Gamma2 - list of Gamma2 (for collapse operators sqrt(Gamma2) * sigma_z)
+
+        Functions
+            - getKraus(qubit, time):
+                return list of 2 x 2 Kraus operators of the given qubit for the given time
+            - getChannels(time):
+                return list of (qubit, Kraus operators) for the qubits with nonzero Gamma1 or Gamma2
+            - evolve(rho, time):
+                return the density matrices (B x 2^N x 2^N array, a 2^N x 2^N sparse matrix, or a ProductState)
+                after evolving rho for the given time, where a memory-mapped array is evolved in place
+        """
+        if(len(Gamma1) != len(Gamma2)): raise ERROR("Gamma1 and Gamma2 should have the same length")
+
+        self.__N      = len(Gamma1)
+        self.__Gamma1 = np.array(Gamma1, dtype=float)
+        self.__Gamma2 = np.array(Gamma2, dtype=float)
+
+    def getKraus(self, qubit, time):
+        # amplitude damping: population of basis(2,0) decays into basis(2,1)
+        p  = np.exp(-self.__Gamma1[qubit] * time)
+        A0 = np.array([[np.sqrt(p), 0], [0, 1]], dtype=complex)
+        A1 = np.array([[0, 0], [np.sqrt(1 - p), 0]], dtype=complex)
+
+        # dephasing: coherence decays with exp(-2 * Gamma2 * t)
+        lamb = np.exp(-2 * self.__Gamma2[qubit] * time)
+        D0   = np.sqrt(0.5 * (1 + lamb)) * np.eye(2, dtype=complex)
+        D1   = np.sqrt(0.5 * (1 - lamb)) * np.diag([1, -1]).astype(complex)
+
+        # the dephasing part of D0 * A1 and D1 * A1 cancels, so they can be merged into A1
+        return [D0 @ A0, D1 @ A0, A1]
+
+    def getChannels(self, time):
+        return [(n, self.getKraus(n, time)) for n in range(self.__N) if (self.__Gamma1[n] > 0.0) or (self.__Gamma2[n] > 0.0)]
+
+    def evolve(self, rho, time):
+        if isinstance(rho, ProductState):
+            # the channels are applied on the block of each qubit
+            for (n, kraus_list) in self.getChannels(time):
+                rho.applyChannel(kraus_list, n)
+            return rho
+
+        if issparse(rho):
+            channel = Sparse.applyChannel
+        elif isinstance(rho, np.memmap):
+            channel = OutOfCore.applyChannel
+        else:
+            channel = applyChannel
+        for (n, kraus_list) in self.getChannels(time):
+            rho = channel(rho, kraus_list, n, self.__N)
+        return rho
+
+
+class TaylorExpmMultiply:
+    def __init__(self, H, c_op_list, tol=1e-10, maxTerms=64, dtype=complex):
+        """
+        Noise engine which applies the action of exp(L * t) on the vectorized density matrix directly,
+        with the scaled and truncated Taylor series (in the style of expm_multiply). Neither the propagator nor
+        the intermediate states are formed, so the memory is O(4^N) with a small constant (plus the sparse Liouvillian).
+
+        Inputs:
+            H         - the (time-independent) Hamiltonian as a Qobj
+            c_op_list - list of collapse operators (Qobj)
+            tol       - [Default as 1e-10] relative tolerance for truncating the Taylor series
+            maxTerms  - [Default as 64] maximum number of Taylor terms for each step
+            dtype     - [Default as complex] data type of the Liouvillian (complex128 or complex64)
+
+        Functions
+            - evolve(rho, time):
+                return the density matrices (B x 2^N x 2^N array) after evolving rho for the given time
+        """
+        if(tol <= 0): raise ERROR("tol should be positive")
+        if(not isinstance(maxTerms, int) or (maxTerms <= 0)): raise ERROR("maxTerms should be a positive integer")
+
+        self.__L        = csr_matrix(liouvillian(H, c_op_list).data).astype(dtype)
+        self.__norm     = abs(self.__L).sum(axis=0).max() # 1-norm of L
+        self.__tol      = tol
+        self.__maxTerms = maxTerms
+
+    def evolve(self, rho, time):
+        # the vectorization (column-stacking) follows the convention of qutip, with each column a member of batch
+        (B, dim, _) = rho.shape
+        v = np.reshape(np.swapaxes(rho, -1, -2), (B, dim * dim)).T
+
+        # split the time into s steps such that || L * t / s ||_1 <= 1
+        s = max(1, int(np.ceil(self.__norm * time)))
+        h = np.array(time / s, dtype=v.real.dtype)
+        for step in range(s):
+            term   = v
+            result = v.copy()
+            for k in range(1, self.__maxTerms + 1):
+                term    = (h / k) * (self.__L @ term)
+                result += term
+                if(np.max(np.abs(term)) <= self.__tol * np.max(np.abs(result))): break
+            v = result
+
+        return np.swapaxes(np.reshape(v.T, (B, dim, dim)), -1, -2)
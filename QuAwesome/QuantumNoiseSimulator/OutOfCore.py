@@ -0,0 +1,147 @@
+# This code is part of QuAwesome.
+#
+#    MIT License
+#
+#    Copyright (c) 2020 and later, Yi-Te Huang
+#
+#    Permission is hereby granted, free of charge, to any person obtaining a copy
+#    of this software and associated documentation files (the "Software"), to deal
+#    in the Software without restriction, including without limitation the rights
+#    to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#    copies of the Software, and to permit persons to whom the Software is
+#    furnished to do so, subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be included in all
+#    copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#    IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#    FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#    LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#    OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#    SOFTWARE.
+#######################################################################################
+import numpy as np
+
+# Kernels acting on the density matrices stored in a memory-mapped file: shape (B, 2^N, 2^N).
+# The rows of the density matrices are streamed through the memory in chunks of at most (about) the given bytes.
+# For a gate on k qubits, each chunk contains h groups of 2^k rows which differ only in the bits of these qubits,
+# so that both U * rho (mixing the rows in each group) and rho * U^dag (mixing the columns in each row) are applied
+# on the chunk alone, and the result is written back in place.
+# The groups can be split into parts (contiguous in the row index, i.e. shards by the high-order qubits), which are
+# disjoint and can be processed by different workers on the same (shared) array.
+
+MEMORY = 2 ** 26 # default size (bytes) of each chunk
+
+def create(filename, N, B=1, dtype=complex):
+    """
+    Return the B x 2^N x 2^N density matrices |0...0><0...0| (with basis(2,1) as |0>) stored in a .npy file
+    as a memory-mapped array \n
+    Inputs:
+        filename - name of the .npy file (will be overwritten)
+        N        - total qubit number
+        B        - [Default as 1] batch size
+        dtype    - [Default as complex] data type of the density matrices
+    """
+    rho = np.lib.format.open_memmap(filename, mode='w+', dtype=dtype, shape=(B, 2 ** N, 2 ** N))
+    rho[:, -1, -1] = 1.0
+    return rho
+
+def applyGate(rho, U, qubits, N, memory=MEMORY, part=0, parts=1):
+    """
+    Apply the gate U (acting on k qubits) on the density matrices in place: U * rho * U^dag \n
+    Inputs:
+        rho    - B x 2^N x 2^N density matrices (memory-mapped or shared array)
+        U      - 2^k x 2^k matrix of the gate, or B x 2^k x 2^k matrices for each member of the batch
+        qubits - list of (internal) qubit index which the gate acts on, ordered as the tensor product of U
+        N      - total qubit number
+        memory - [Default as MEMORY] size (bytes) of each chunk
+        part   - [Default as 0] index of the part of row groups to process
+        parts  - [Default as 1] number of parts
+    """
+    U    = U.astype(rho.dtype, copy=False)
+    Udag = np.conj(np.swapaxes(U, -1, -2))
+    k    = len(qubits)
+    cols = [2 + q for q in qubits]
+
+    for idx in rowChunks(rho, qubits, N, memory, part, parts):
+        # U * rho: mix the rows in each group
+        X = rho[:, idx, :]
+        X = U @ np.reshape(X, (X.shape[0], 2 ** k, -1))
+
+        # (U * rho) * U^dag: move the column axes of the qubits to the end
+        X = np.moveaxis(np.reshape(X, (X.shape[0], -1) + (2,) * N), cols, list(range(N + 2 - k, N + 2)))
+        shape = X.shape
+        X = np.reshape(X, (shape[0], -1, 2 ** k)) @ Udag
+        X = np.moveaxis(np.reshape(X, shape), list(range(N + 2 - k, N + 2)), cols)
+
+        rho[:, idx, :] = np.reshape(X, (X.shape[0], len(idx), -1))
+    return rho
+
+def applyChannel(rho, kraus_list, qubit, N, memory=MEMORY, part=0, parts=1):
+    """
+    Apply a single qubit channel, given by its 2 x 2 Kraus operators, on the density matrices in place \n
+    Inputs:
+        rho        - B x 2^N x 2^N density matrices (memory-mapped or shared array)
+        kraus_list - list of 2 x 2 Kraus operators
+        qubit      - the (internal) index of qubit, from 0 to N - 1
+        N          - total qubit number
+        memory     - [Default as MEMORY] size (bytes) of each chunk
+        part       - [Default as 0] index of the part of row groups to process
+        parts      - [Default as 1] number of parts
+    """
+    # local superoperator: S[(a, b), (c, d)] = sum_k K[a, c] * conj(K[b, d])
+    S = sum([np.kron(K, np.conj(K)) for K in kraus_list]).astype(rho.dtype, copy=False)
+
+    for idx in rowChunks(rho, [qubit], N, memory, part, parts):
+        # move the column axis of the qubit next to the row axis, and apply S on them
+        X = np.reshape(rho[:, idx, :], (rho.shape[0], 2, -1) + (2,) * N)
+        X = np.moveaxis(X, 3 + qubit, 2)
+        shape = X.shape
+        X = S @ np.reshape(X, (shape[0], 4, -1))
+        X = np.moveaxis(np.reshape(X, shape), 2, 3 + qubit)
+
+        rho[:, idx, :] = np.reshape(X, (X.shape[0], len(idx), -1))
+    return rho
+
+def drift(rho, memory=MEMORY):
+    """
+    Return (trace, hermiticity) of the density matrices, that is, the B array of Tr(rho) and max | rho - rho^dag | \n
+    Inputs:
+        rho    - B x 2^N x 2^N density matrices (memory-mapped array)
+        memory - [Default as MEMORY] size (bytes) of each chunk
+    """
+    trace = np.trace(rho, axis1=1, axis2=2).astype(np.complex128)
+    herm  = 0.0
+    h     = max(1, memory // (2 * rho.shape[0] * rho.shape[1] * rho.itemsize))
+    for r in range(0, rho.shape[1], h):
+        rows = rho[:, r:r + h, :].astype(np.complex128)
+        cols = rho[:, :, r:r + h].astype(np.complex128)
+        herm = max(herm, float(np.max(np.abs(rows - np.conj(np.swapaxes(cols, -1, -2))))))
+    return (trace, herm)
+
+def rowChunks(rho, qubits, N, memory=MEMORY, part=0, parts=1):
+    """
+    Yield the row index of each chunk: the groups of 2^k rows differing only in the bits of the given qubits,
+    ordered as (group member, group), where the group member is ordered as the tensor product of the qubits \n
+    Inputs:
+        rho    - B x 2^N x 2^N density matrices
+        qubits - list of (internal) qubit index
+        N      - total qubit number
+        memory - [Default as MEMORY] size (bytes) of each chunk
+        part   - [Default as 0] index of the part of row groups
+        parts  - [Default as 1] number of parts
+    """
+    k       = len(qubits)
+    bits    = [N - 1 - q for q in qubits]
+    offsets = np.zeros(2 ** k, dtype=np.int64)
+    for (i, b) in enumerate(bits):
+        offsets |= ((np.arange(2 ** k) >> (k - 1 - i)) & 1) << b
+
+    rows = np.arange(2 ** N, dtype=np.int64)
+    base = rows[(rows & int(offsets[-1])) == 0]
+    base = base[part * len(base) // parts:(part + 1) * len(base) // parts]
+    h    = max(1, memory // (2 ** k * rho.shape[0] * rho.shape[2] * rho.itemsize))
+    for start in range(0, len(base), h):
+        yield (offsets[:, None] | base[None, start:start + h]).ravel()
@@ -0,0 +1,102 @@
+# This code is part of QuAwesome.
+#
+#    MIT License
+#
+#    Copyright (c) 2020 and later, Yi-Te Huang
+#
+#    Permission is hereby granted, free of charge, to any person obtaining a copy
+#    of this software and associated documentation files (the "Software"), to deal
+#    in the Software without restriction, including without limitation the rights
+#    to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#    copies of the Software, and to permit persons to whom the Software is
+#    furnished to do so, subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be included in all
+#    copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#    IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#    FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#    LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#    OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#    SOFTWARE.
+#######################################################################################
+from QuAwesome import QuAwesomeError as ERROR
+import numpy as np
+
+# Expectation values of Pauli strings, without building the 2^N x 2^N observables.
+# In the basis of qutip (basis(2,1) as |0>), a Pauli string P acts on the index k of the basis as
+#     P |k> = phase * (-1)^popcount(k & zmask) |k ^ xmask>,
+# where xmask marks the X and Y factors, zmask marks the Y and Z factors, and phase = i^{#Y} * (-1)^{#Y + #Z}
+# (the logical Y and Z are -sigmay and -sigmaz in the basis of qutip). Therefore
+#     Tr(P * rho) = phase * sum_k (-1)^popcount(k & zmask) * rho[k, k ^ xmask],
+# and for each xmask, the sums for all of the zmask are given by one Walsh-Hadamard transform of rho[k, k ^ xmask].
+
+def masks(paulis, positions):
+    """
+    Return the arrays (xmask, zmask, phase) of the Pauli strings \n
+    Inputs:
+        paulis    - list of Pauli strings composed of 'I', 'X', 'Y', 'Z'
+        positions - list of bit positions (in the index of basis) for each character of the strings
+    """
+    xmask = np.zeros(len(paulis), dtype=np.int64)
+    zmask = np.zeros(len(paulis), dtype=np.int64)
+    phase = np.ones(len(paulis), dtype=complex)
+    for (p, string) in enumerate(paulis):
+        if(not isinstance(string, str) or (len(string) != len(positions))):
+            raise ERROR("Each Pauli string should be a string with length " + str(len(positions)))
+        for (c, pos) in zip(string.upper(), positions):
+            if(c == 'X'):
+                xmask[p] |= (1 << pos)
+            elif(c == 'Y'):
+                xmask[p] |= (1 << pos)
+                zmask[p] |= (1 << pos)
+                phase[p] *= -1.0j
+            elif(c == 'Z'):
+                zmask[p] |= (1 << pos)
+                phase[p] *= -1.0
+            elif(c != 'I'):
+                raise ERROR("Pauli strings should only contain 'I', 'X', 'Y', and 'Z'")
+    return (xmask, zmask, phase)
+
+def walshHadamard(G, N):
+    """
+    Return the (unnormalized) Walsh-Hadamard transform along the last axis (with length 2^N):
+        result[..., z] = sum_k (-1)^popcount(k & z) * G[..., k]
+    """
+    shape = G.shape
+    G     = np.reshape(G, (-1,) + (2,) * N)
+    for n in range(1, N + 1):
+        (G0, G1) = (np.take(G, 0, axis=n), np.take(G, 1, axis=n))
+        G = np.stack([G0 + G1, G0 - G1], axis=n)
+    return np.reshape(G, shape)
+
+def expectation(gather, paulis, positions, N, chunk=256):
+    """
+    Return the B x P array of expectation values of the Pauli strings \n
+    Inputs:
+        gather    - function which maps the array of U xmasks into the B x U x 2^N array of rho[k, k ^ xmask]
+        paulis    - list of P Pauli strings
+        positions - list of bit positions (in the index of basis) for each character of the strings
+        N         - total qubit number
+        chunk     - [Default as 256] number of xmasks gathered at once (to bound the memory)
+    """
+    (xmask, zmask, phase) = masks(paulis, positions)
+    (unique, inverse)     = np.unique(xmask, return_inverse=True)
+
+    result = None
+    for start in range(0, len(unique), chunk):
+        # Walsh-Hadamard transforms of rho[k, k ^ xmask] for each xmask in this chunk
+        W = walshHadamard(gather(unique[start:start + chunk]), N)
+        if(result is None):
+            result = np.zeros((W.shape[0], len(paulis)), dtype=float)
+
+        # pick the values of the Pauli strings with xmask in this chunk
+        sel = np.nonzero((inverse >= start) & (inverse < start + chunk))[0]
+        result[:, sel] = np.real(phase[sel] * W[:, inverse[sel] - start, zmask[sel]])
+
+    # no Pauli string: B x 0 array (the batch size is read from the gathered diagonal)
+    if(result is None):
+        result = np.zeros((gather(np.zeros(1, dtype=np.int64)).shape[0], 0), dtype=float)
+    return result
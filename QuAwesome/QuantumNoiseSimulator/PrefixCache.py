@@ -0,0 +1,134 @@
+# This code is part of QuAwesome.
+#
+#    MIT License
+#
+#    Copyright (c) 2020 and later, Yi-Te Huang
+#
+#    Permission is hereby granted, free of charge, to any person obtaining a copy
+#    of this software and associated documentation files (the "Software"), to deal
+#    in the Software without restriction, including without limitation the rights
+#    to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#    copies of the Software, and to permit persons to whom the Software is
+#    furnished to do so, subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be included in all
+#    copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#    IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#    FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#    LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#    OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#    SOFTWARE.
+#######################################################################################
+from QuAwesome import QuAwesomeError as ERROR
+from collections import OrderedDict
+import numpy as np
+from scipy.sparse import issparse
+
+class PrefixCache:
+    def __init__(self, memory=2 ** 30, stride=8):
+        """
+        Prefix-trie cache of intermediate states for families of circuits sharing a preparation.
+        The trie is keyed by the sequence of program steps of the simulator (the tuple of keys of the gate operations
+        (name, params, qubits, time) fused into each step), and each node can store the state after applying the steps
+        along its path. The stored states are evicted in least recently used order
+        once the total size exceeds the memory budget. The cache can be shared by several QuantumNoiseSimulator objects.
+
+        Inputs:
+            memory - [Default as 2^30] memory budget (in bytes) of the stored states
+            stride - [Default as 8] the states are stored after every stride steps (and at the end of each run)
+
+        Functions
+            - getStride():
+                return the stride of stored states
+            - getMemory():
+                return the total size (in bytes) of the stored states
+            - lookup(config, keys):
+                return (depth, state) of the deepest stored prefix of the given sequence, or (0, None)
+            - store(config, keys, state):
+                store a copy of the state after applying the given sequence
+            - clear():
+                remove all of the stored states
+        """
+        if(not isinstance(memory, int) or (memory <= 0)): raise ERROR("memory should be a positive integer")
+        if(not isinstance(stride, int) or (stride <= 0)): raise ERROR("stride should be a positive integer")
+
+        self.__budget = memory
+        self.__stride = stride
+        self.__size   = 0
+        self.__roots  = {}            # simulator configuration -> root node
+        self.__lru    = OrderedDict() # id of node -> node, for the nodes storing states
+
+    @staticmethod
+    def key(op):
+        # hashable key of the operation (name, params, qubits, time), where the array parameters (batch mode) are converted to tuple
+        (name, params, qubits, time) = op
+        params = tuple([tuple(np.ravel(p).tolist()) if isinstance(p, np.ndarray) else p for p in params])
+        return (name, params, tuple(qubits), time)
+
+    def getStride(self): return self.__stride
+
+    def getMemory(self): return self.__size
+
+    def lookup(self, config, keys):
+        node  = self.__roots.get(config)
+        found = (0, None)
+        for (depth, k) in enumerate(keys):
+            if(node is None): break
+            node = node['children'].get(k)
+            if(node is not None) and (node['state'] is not None):
+                found = (depth + 1, node)
+
+        if(found[1] is None): return (0, None)
+        self.__lru.move_to_end(id(found[1]))
+        return (found[0], self.__Copy(found[1]['state']))
+
+    def store(self, config, keys, state):
+        size = self.__Size(state)
+        if(size > self.__budget): return
+
+        # create the path of nodes
+        node = self.__roots.setdefault(config, self.__Node(None, None))
+        for k in keys:
+            if k not in node['children']:
+                node['children'][k] = self.__Node(node, k)
+            node = node['children'][k]
+
+        # store the state
+        if(node['state'] is not None):
+            self.__size -= self.__Size(node['state'])
+        node['state'] = self.__Copy(state)
+        self.__size  += size
+        self.__lru[id(node)] = node
+        self.__lru.move_to_end(id(node))
+
+        # evict the least recently used states
+        while(self.__size > self.__budget):
+            (_, old) = self.__lru.popitem(last=False)
+            self.__size -= self.__Size(old['state'])
+            old['state'] = None
+            self.__Prune(old)
+
+    def clear(self):
+        self.__roots.clear()
+        self.__lru.clear()
+        self.__size = 0
+
+    def __Node(self, parent, key):
+        return {'parent': parent, 'key': key, 'children': {}, 'state': None}
+
+    # Remove the nodes without stored state and children
+    def __Prune(self, node):
+        while(node['parent'] is not None) and (node['state'] is None) and (len(node['children']) == 0):
+            del node['parent']['children'][node['key']]
+            node = node['parent']
+
+    def __Copy(self, state):
+        return state.copy()
+
+    def __Size(self, state):
+        if issparse(state):
+            return state.data.nbytes + state.indices.nbytes + state.indptr.nbytes
+        return state.nbytes
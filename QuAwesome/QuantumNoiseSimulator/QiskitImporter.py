@@ -0,0 +1,189 @@
+# This code is part of QuAwesome.
+#
+#    MIT License
+#
+#    Copyright (c) 2020 and later, Yi-Te Huang
+#
+#    Permission is hereby granted, free of charge, to any person obtaining a copy
+#    of this software and associated documentation files (the "Software"), to deal
+#    in the Software without restriction, including without limitation the rights
+#    to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#    copies of the Software, and to permit persons to whom the Software is
+#    furnished to do so, subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be included in all
+#    copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#    IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#    FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#    LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#    OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#    SOFTWARE.
+#######################################################################################
+from QuAwesome import QuAwesomeError as ERROR
+from collections import OrderedDict
+from numpy import pi
+from qiskit import QuantumCircuit, transpile
+from qiskit.circuit import Parameter, ParameterExpression
+
+# Lowering rules from the gates of qiskit to the native gates of QuantumNoiseSimulator ('iden', 'u1', 'u2', 'u3', 'cx', 'cu3').
+# Each rule maps the list of gate parameters p into a list of (native gate, parameters, position of the gate qubits).
+# Global phases are dropped since they do not change the density matrix.
+RULES = {
+    'id'   : lambda p: [('iden', (), (0,))],
+    'u1'   : lambda p: [('u1', (p[0],), (0,))],
+    'p'    : lambda p: [('u1', (p[0],), (0,))],
+    'rz'   : lambda p: [('u1', (p[0],), (0,))],
+    'u2'   : lambda p: [('u2', (p[0], p[1]), (0,))],
+    'u3'   : lambda p: [('u3', (p[0], p[1], p[2]), (0,))],
+    'u'    : lambda p: [('u3', (p[0], p[1], p[2]), (0,))],
+    'rx'   : lambda p: [('u3', (p[0], -pi / 2, pi / 2), (0,))],
+    'ry'   : lambda p: [('u3', (p[0], 0., 0.), (0,))],
+    'x'    : lambda p: [('u3', (pi, 0., pi), (0,))],
+    'y'    : lambda p: [('u3', (pi, pi / 2, pi / 2), (0,))],
+    'z'    : lambda p: [('u3', (0., 0., pi), (0,))],
+    'h'    : lambda p: [('u3', (pi / 2, 0., pi), (0,))],
+    's'    : lambda p: [('u3', (0., 0., pi / 2), (0,))],
+    'sdg'  : lambda p: [('u3', (0., 0., -pi / 2), (0,))],
+    't'    : lambda p: [('u3', (0., 0., pi / 4), (0,))],
+    'tdg'  : lambda p: [('u3', (0., 0., -pi / 4), (0,))],
+    'sx'   : lambda p: [('u3', (pi / 2, -pi / 2, pi / 2), (0,))],
+    'sxdg' : lambda p: [('u3', (-pi / 2, -pi / 2, pi / 2), (0,))],
+    'cx'   : lambda p: [('cx', (), (0, 1))],
+    'cu3'  : lambda p: [('cu3', (p[0], p[1], p[2]), (0, 1))],
+    'cz'   : lambda p: [('u3', (pi / 2, 0., pi), (1,)), ('cx', (), (0, 1)), ('u3', (pi / 2, 0., pi), (1,))],
+    'swap' : lambda p: [('cx', (), (0, 1)), ('cx', (), (1, 0)), ('cx', (), (0, 1))],
+}
+
+# Instructions which do not act on the quantum state
+IGNORED = ['barrier', 'measure', 'delay']
+
+class QiskitImporter:
+    def __init__(self, cacheSize=256):
+        """
+        Importer which lowers the qiskit QuantumCircuit into the native gates of QuantumNoiseSimulator.
+        The lowered form is cached by the circuit structure (gate names, qubits, and number of parameters),
+        so that running the same ansatz with different parameters only needs to bind the parameter values.
+        The standard gates of qiskit without lowering rule are transpiled into 'u3' and 'cx' once (for each name, number
+        of qubits, and number of parameters), with symbolic parameters. The other (custom or composite) gates are
+        identified by the gate object itself, and they are transpiled with their own parameters.
+
+        Inputs:
+            cacheSize - [Default as 256] maximum number of lowered circuits stored in the cache
+
+        Functions
+            - lower(circuit):
+                return list of native gates: (name, params, qubits), where qubits are the qubit index in circuit
+            - clearCache():
+                remove all of the stored lowered circuits and gate templates
+        """
+        if(not isinstance(cacheSize, int) or (cacheSize <= 0)): raise ERROR("cacheSize should be a positive integer")
+
+        self.__cacheSize = cacheSize
+        self.__cache     = OrderedDict() # circuit structure -> (operations, list of (rule, qubits))
+        self.__templates = {}            # (gate name, number of qubits, number of parameters) -> rule from transpiled template
+
+    def lower(self, circuit):
+        if(not isinstance(circuit, QuantumCircuit)): raise ERROR("circuit should be a qiskit QuantumCircuit")
+
+        index  = {q: i for (i, q) in enumerate(circuit.qubits)}
+        data   = [inst for inst in circuit.data if inst.operation.name not in IGNORED]
+        values = [inst.operation.params if self.__isStandard(inst.operation) else [] for inst in data]
+        qubits = [tuple([index[q] for q in inst.qubits]) for inst in data]
+        key    = tuple([self.__Key(inst.operation) + (pos,) for (inst, pos) in zip(data, qubits)])
+
+        # cache hit: mark as the most recently used one
+        if key in self.__cache:
+            self.__cache.move_to_end(key)
+            compiled = self.__cache[key][1]
+
+        # cache miss: compile the circuit and drop the least recently used one if needed
+        # (the operations are stored with it, so that the identity of the custom gates in the key stays valid)
+        else:
+            compiled = [(self.__Rule(inst.operation), pos) for (inst, pos) in zip(data, qubits)]
+            self.__cache[key] = ([inst.operation for inst in data], compiled)
+            if len(self.__cache) > self.__cacheSize:
+                self.__cache.popitem(last=False)
+
+        # bind the parameters
+        gates = []
+        for ((rule, qubits), p) in zip(compiled, values):
+            for (name, params, pos) in rule([self.__Value(v) for v in p]):
+                gates.append((name, params, tuple([qubits[j] for j in pos])))
+        return gates
+
+    def clearCache(self):
+        self.__cache.clear()
+        self.__templates.clear()
+
+    # Check if the operation is a standard gate of qiskit, which is determined by its name, number of qubits, and parameters
+    def __isStandard(self, operation):
+        return operation.base_class.__module__.startswith('qiskit.circuit.library.standard_gates')
+
+    # Return the key of the operation in the circuit structure
+    def __Key(self, operation):
+        if self.__isStandard(operation):
+            return (operation.name, operation.num_qubits, len(operation.params))
+        return (operation.name, operation.num_qubits, id(operation))
+
+    # Return the lowering rule of the given operation
+    def __Rule(self, operation):
+        if not self.__isStandard(operation):
+            return self.__Lower(operation)
+        if operation.name in RULES:
+            return RULES[operation.name]
+
+        key = (operation.name, operation.num_qubits, len(operation.params))
+        if key not in self.__templates:
+            self.__templates[key] = self.__Template(operation)
+        return self.__templates[key]
+
+    # Transpile the (custom or composite) operation with its own parameters into 'u3' and 'cx', and return the rule
+    def __Lower(self, operation):
+        try:
+            qc = QuantumCircuit(operation.num_qubits)
+            qc.append(operation, list(range(operation.num_qubits)))
+            qc = transpile(qc, basis_gates=['u3', 'cx'], optimization_level=0)
+        except Exception:
+            raise ERROR("The gate '" + operation.name + "' can not be lowered into native gates")
+
+        gates = []
+        for inst in qc.data:
+            pos = tuple([qc.find_bit(q).index for q in inst.qubits])
+            gates.append((inst.operation.name, tuple([self.__Value(v) for v in inst.operation.params]), pos))
+        return lambda p: gates
+
+    # Transpile the operation with symbolic parameters into 'u3' and 'cx', and return the rule binding the parameters
+    def __Template(self, operation):
+        symbols = [Parameter('p' + str(j)) for j in range(len(operation.params))]
+        try:
+            gate = type(operation)(*symbols) if (len(symbols) > 0) else operation
+            qc   = QuantumCircuit(operation.num_qubits)
+            qc.append(gate, list(range(operation.num_qubits)))
+            qc   = transpile(qc, basis_gates=['u3', 'cx'], optimization_level=0)
+        except Exception:
+            raise ERROR("The gate '" + operation.name + "' can not be lowered into native gates")
+
+        template = []
+        for inst in qc.data:
+            pos = tuple([qc.find_bit(q).index for q in inst.qubits])
+            template.append((inst.operation.name, tuple(inst.operation.params), pos))
+
+        def rule(p):
+            bind = dict(zip(symbols, p))
+            return [(name, tuple([self.__Bind(e, bind) for e in params]), pos) for (name, params, pos) in template]
+        return rule
+
+    # Return the value of the (bound) parameter as float
+    def __Value(self, value):
+        if isinstance(value, ParameterExpression):
+            if len(value.parameters) > 0:
+                raise ERROR("The circuit contains unbound parameters: " + str(value.parameters))
+        return float(value)
+
+    def __Bind(self, expr, bind):
+        if isinstance(expr, ParameterExpression):
+            return float(expr.bind({s: v for (s, v) in bind.items() if s in expr.parameters}))
+        return float(expr)
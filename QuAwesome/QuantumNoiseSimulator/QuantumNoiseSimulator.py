@@ -24,54 +24,179 @@
 #######################################################################################
 from QuAwesome import Device
 from QuAwesome import QuAwesomeError as ERROR
+from QuAwesome.QuantumNoiseSimulator import Gates
+from QuAwesome.QuantumNoiseSimulator.Circuit import Circuit
+from QuAwesome.QuantumNoiseSimulator.Kernel import applyGate, applyGateVector
+from QuAwesome.QuantumNoiseSimulator import Measurement, Sparse, Pauli, OutOfCore
+from QuAwesome.QuantumNoiseSimulator.Noise import LindbladPropagator, KrausNoise, TaylorExpmMultiply
+from QuAwesome.QuantumNoiseSimulator.Trajectory import runTrajectories
+from QuAwesome.QuantumNoiseSimulator.QiskitImporter import QiskitImporter
+from QuAwesome.QuantumNoiseSimulator.PrefixCache import PrefixCache
+from QuAwesome.QuantumNoiseSimulator.Blocks import ProductState
+from QuAwesome.QuantumNoiseSimulator.Shards import ShardedState
 import numpy as np
-from qutip import Qobj, qeye, basis, sigmax, sigmaz, destroy, tensor, Options, mesolve
+from scipy.sparse import csr_matrix, issparse
+from qutip import Qobj, qeye, sigmax, sigmaz, destroy, tensor, Options, mesolve
 
 class QuantumNoiseSimulator:
+    # importer of qiskit circuits, where the cache of lowered circuits is shared by all of the simulators
+    __importer = QiskitImporter()
+
 ##### Constructors #####
     # constructor
-    def __init__(self, Q_min, Q_max, device):
+    def __init__(self, Q_min, Q_max, device, noise='mesolve', cacheSize=16, lazy=False, moments=False, batch=None,
+                 method='density', ntraj=500, processes=1, seed=None, sparse=False, fillRatio=0.1,
+                 prefixCache=None, tol=None, precision='double', partition=False, memmap=None):
+        # Q_min, Q_max: simulate the qubits from Q_min to Q_max, or Q_min can be a list of qubit index (with Q_max as None)
+        #               to simulate only these qubits (e.g. [0, 20] gives a 2-qubit state), where each qubit keeps its own
+        #               Gamma1, Gamma2, and gate times of the device
+        # noise engine:
+        #   'mesolve'    - integrate the Lindblad Master Equation for each gate
+        #   'propagator' - apply the cached propagator exp(L * t) for each distinct gate time
+        #   'kraus'      - apply the amplitude damping and dephasing channels of each qubit in closed form
+        #   None         - disable the noise
+        #   'taylor'     - apply the action of exp(L * t) on the vectorized density matrix with the truncated Taylor series,
+        #                  where tol is the relative tolerance for truncating the series [Default as None: 1e-10 (double), 1e-6 (single)]
+        # lazy: if True, gates are only recorded into a Circuit, and they are applied (with gate fusion) when calling run()
+        # moments: if True (implies lazy), the recorded gates are packed into moments (layers) on disjoint qubits,
+        #          and the noise is applied once for each moment with the longest gate time in it
+        # batch: number of parameter sets K (None for a single circuit). In batch mode, the parameters of
+        #        u1, u2, u3, and cu3 can be arrays with length K, and the states carry a leading batch axis
+        # method:
+        #   'density'    - evolve the 2^N x 2^N density matrix
+        #   'trajectory' - (implies lazy) evolve ntraj 2^N state vectors with stochastic jumps sampled from the
+        #                  Kraus maps of each qubit, where the trajectories run in parallel across processes
+        #                  and the results are averaged. The given noise engine is not used in this method.
+        # processes: number of worker processes for the 'trajectory' method, or for the 'density' method (requires the 'kraus'
+        #            noise engine), where the density matrix in shared memory is sharded by the high-order qubits across
+        #            processes (a power of 2), and the gates and noise are applied by the workers on their shards
+        # sparse: if True, the density matrix and gate operators are stored as sparse (CSR) matrices (requires the
+        #         'kraus' noise engine), and they are switched to dense arrays once the ratio of nonzero elements
+        #         in the density matrix exceeds fillRatio
+        # prefixCache: a PrefixCache object (implies lazy), which can be shared by several simulators. The states after the
+        #              recorded gates are stored in the cache, and the circuits sharing a prefix resume from the deepest stored one
+        # precision:
+        #   'double' - store the states, gates, and noise maps in complex128
+        #   'single' - store the states, gates, and noise maps in complex64 with matching ODE (and Taylor) tolerances,
+        #              the numerical drift of the states can be checked by getDrift()
+        # partition: if True, the unentangled groups of qubits are tracked as separate density matrices (blocks),
+        #            which are merged only when a two qubit gate acts across them (requires the 'kraus' noise engine).
+        #            measure(), expect(), and sample() are computed from the blocks, and getState() assembles the full state
+        # memmap: name of a .npy file to store the density matrices as a memory-mapped array (requires the 'kraus' noise engine),
+        #         where the gates and the noise are applied in place on chunks of rows streamed through the memory
+        # If the noise is disabled, or all of the Gamma1 and Gamma2 of the simulated qubits are zero, the simulator
+        # automatically evolves the 2^N state vector (method 'statevector') with the same gate API and measure() output
         # check if device is an QuAwesome.Device type object
         if(not isinstance(device, Device)):
             raise ERROR("The device should be an QuAwesome.Device type object")
+        if(noise not in [None, 'mesolve', 'propagator', 'kraus', 'taylor']):
+            raise ERROR("noise should be None, 'mesolve', 'propagator', 'kraus', or 'taylor'")
+        if((batch is not None) and (not isinstance(batch, int) or (batch <= 0))):
+            raise ERROR("batch should be None or a positive integer")
+        if(precision not in ['double', 'single']):
+            raise ERROR("precision should be either 'double' or 'single'")
+        if(method not in ['density', 'trajectory']):
+            raise ERROR("method should be either 'density' or 'trajectory'")
+        if(method == 'trajectory'):
+            if(batch is not None): raise ERROR("batch mode is not supported by the 'trajectory' method")
+            if(not isinstance(ntraj, int) or (ntraj <= 0)): raise ERROR("ntraj should be a positive integer")
+            if(not isinstance(processes, int) or (processes <= 0)): raise ERROR("processes should be a positive integer")
+        if(sparse):
+            if(noise != 'kraus'): raise ERROR("sparse backend requires the 'kraus' noise engine")
+            if((batch is not None) or (method != 'density')): raise ERROR("sparse backend only supports the 'density' method without batch")
+        if(partition):
+            if(noise != 'kraus'): raise ERROR("partition requires the 'kraus' noise engine")
+            if(sparse or (method != 'density')): raise ERROR("partition only supports the dense 'density' method")
+        if((method == 'density') and (processes != 1)):
+            if(noise != 'kraus'): raise ERROR("the sharded density matrix (processes > 1) requires the 'kraus' noise engine")
+            if(sparse or partition or (memmap is not None) or (prefixCache is not None)):
+                raise ERROR("the sharded density matrix (processes > 1) does not support sparse, partition, memmap, and prefixCache")
+        if(memmap is not None):
+            if(noise != 'kraus'): raise ERROR("memmap requires the 'kraus' noise engine")
+            if(sparse or partition or (method != 'density') or (prefixCache is not None)):
+                raise ERROR("memmap only supports the dense 'density' method without prefixCache")
+        if(prefixCache is not None):
+            if(not isinstance(prefixCache, PrefixCache)): raise ERROR("prefixCache should be a PrefixCache object")
+            if(method != 'density'): raise ERROR("prefixCache only supports the 'density' method")
 
         # get info. from Device
-        self.__N        = device.getN()
-        self.__Q_min    = 0
-        self.__Q_max    = self.__N - 1
-        self.__Gamma1   = device.getGamma1_list()
-        self.__Gamma2   = device.getGamma2_list()
-        self.__GateTime = device.getGateTime()
-
-        # check if Q_min and Q_max is legal, than reset Q_min, Q_max, and N
-        if(Q_min > Q_max): raise ERROR("Q_min should be smaller than or equal Q_max")
-        self.__isLegal(Q_min)
-        self.__isLegal(Q_max)
-        self.__Q_min = Q_min
-        self.__Q_max = Q_max
-        self.__N     = self.__Q_max - self.__Q_min + 1
+        self.__N         = device.getN()
+        self.__qubits    = list(range(self.__N))
+        self.__GateTable = device.getGateTable()
+
+        # check if Q_min and Q_max (or the list of qubits) is legal, than reset the simulated qubits and N
+        if(isinstance(Q_min, list)):
+            if((Q_max is not None) or (len(Q_min) == 0) or (len(set(Q_min)) != len(Q_min))):
+                raise ERROR("Q_min should be a non-empty list of different qubit index (with Q_max as None)")
+            qubits = sorted(Q_min)
+        else:
+            if(Q_min > Q_max): raise ERROR("Q_min should be smaller than or equal Q_max")
+            qubits = [Q_min, Q_max]
+        for q in qubits:
+            if(not isinstance(q, int) or (q < 0) or (q >= self.__N)):
+                raise ERROR("Qubit Index should be between 0 and " + str(self.__N - 1))
+        self.__qubits = qubits if isinstance(Q_min, list) else list(range(Q_min, Q_max + 1))
+        self.__index  = {q: n for (n, q) in enumerate(self.__qubits)} # qubit index -> internal index
+        self.__N      = len(self.__qubits)
+        self.__dims   = [[2] * self.__N, [2] * self.__N]
+
+        # Gamma1 and Gamma2 of the simulated qubits (zero if they are not set in the device)
+        Gamma1 = device.getGamma1_list()
+        Gamma2 = device.getGamma2_list()
+        self.__Gamma1 = [Gamma1[q] for q in self.__qubits] if (len(Gamma1) > 0) else [0.0] * self.__N
+        self.__Gamma2 = [Gamma2[q] for q in self.__qubits] if (len(Gamma2) > 0) else [0.0] * self.__N
 
         # set some needed variables
-        self.__sx   = sigmax()
         self.__sz   = sigmaz()
         self.__sm   = destroy(2).dag()
-        self.__up   = basis(2,0) * basis(2,0).dag()
-        self.__down = basis(2,1) * basis(2,1).dag()
         self.__I_list    = [qeye(2) for n in range(self.__N)]
-        self.__ODEoption = Options(nsteps=15000, store_states=True,rtol=1e-14,atol=1e-14)
+        self.__dtype     = np.complex128 if (precision == 'double') else np.complex64
+        self.__tol       = 1e-14 if (precision == 'double') else 1e-6
+        self.__ODEoption = Options(nsteps=15000, store_states=True, rtol=self.__tol, atol=self.__tol)
+
+        # use state vectors if there is no noise
+        self.__batch  = batch
+        self.__method = method
+        if((noise is None) or (not any(self.__Gamma1) and not any(self.__Gamma2))):
+            self.__method = 'statevector'
+            sparse        = False
+
+        # set initial state as |0...0><0...0| with basis(2,1) as |0> (the last element in the basis of qutip)
+        # (density matrices, state vectors of each trajectory, state vectors, or blocks of density matrices)
+        if(self.__method == 'statevector'):
+            self.__state = np.zeros((1 if (batch is None) else batch, 2 ** self.__N), dtype=self.__dtype)
+            self.__state[:, -1] = 1.0
+        elif(self.__method == 'trajectory'):
+            self.__state = None
+            self.__psi   = np.zeros((ntraj, 2 ** self.__N), dtype=self.__dtype)
+            self.__psi[:, -1] = 1.0
+            self.__processes = processes
+            self.__seed      = np.random.SeedSequence(seed)
+        elif(processes != 1):
+            self.__Shards = ShardedState(self.__N, 1 if (batch is None) else batch, self.__dtype, processes)
+            self.__state  = self.__Shards.getArray()
+        elif(memmap is not None):
+            self.__state = OutOfCore.create(memmap, self.__N, 1 if (batch is None) else batch, self.__dtype)
+        elif(partition):
+            self.__state = ProductState(self.__N, 1 if (batch is None) else batch, self.__dtype)
+        else:
+            self.__state = np.zeros((1 if (batch is None) else batch, 2 ** self.__N, 2 ** self.__N), dtype=self.__dtype)
+            self.__state[:, -1, -1] = 1.0
 
-        # set Hamiltonian as 0
-        self.__H    = self.__I_list.copy()
-        self.__H[0] = sigmax()
-        self.__H    = 0 * tensor(self.__H)
+        # set block partition (the state is a ProductState of unentangled blocks)
+        self.__partition = partition and (self.__method == 'density')
+        self.__memmap    = (memmap is not None) and (self.__method == 'density')
+        self.__sharded   = (processes != 1) and (self.__method == 'density')
 
-        # set initial state (density matrix)
-        self.__state = tensor( [basis(2,1) for n in range(self.__N)] )
-        self.__state = self.__state * self.__state.dag()
+        # set sparse backend (the state is a single 2^N x 2^N CSR matrix while it is sparse)
+        self.__sparse    = sparse
+        self.__fillRatio = fillRatio
+        if(self.__sparse):
+            self.__state = csr_matrix(self.__state[0], dtype=self.__dtype)
 
-        # set C operator list
+        # set C operator list (the 'kraus' engine and the 'trajectory' method only need the Gamma lists)
         self.__c_op_list = []
-        for n in range(self.__N):
+        for n in range(self.__N if ((noise != 'kraus') and (self.__method == 'density')) else 0):
             if self.__Gamma1[n] > 0.0:
                 sm = self.__I_list.copy()
                 sm[n] = self.__sm
@@ -81,55 +206,129 @@ class QuantumNoiseSimulator:
                 sz[n] = self.__sz
                 self.__c_op_list.append(np.sqrt(self.__Gamma2[n]) * tensor(sz))
 
+        # set Hamiltonian as 0 (only needed by the engines on the full Liouvillian)
+        if((noise not in [None, 'kraus']) and (self.__method == 'density')):
+            self.__H    = self.__I_list.copy()
+            self.__H[0] = sigmax()
+            self.__H    = 0 * tensor(self.__H)
+
+        # set noise engine
+        self.__noise = noise
+        if(self.__method != 'density'):
+            pass
+        elif(self.__noise == 'propagator'):
+            self.__Propagator = LindbladPropagator(self.__H, self.__c_op_list, cacheSize, self.__dtype)
+        elif(self.__noise == 'taylor'):
+            self.__Taylor = TaylorExpmMultiply(self.__H, self.__c_op_list, (1e-10 if (precision == 'double') else 1e-6) if (tol is None) else tol, dtype=self.__dtype)
+        elif(self.__noise == 'kraus'):
+            self.__Kraus = KrausNoise(self.__Gamma1, self.__Gamma2)
+
+        # set circuit for the deferred mode
+        self.__lazy    = lazy or moments or (self.__method == 'trajectory') or (prefixCache is not None)
+        self.__moments = moments
+        self.__circuit = Circuit()
+
+        # set prefix cache, with the keys of executed gates
+        self.__prefixCache = prefixCache
+        self.__history     = []
+        self.__config      = (tuple(self.__qubits), tuple(self.__Gamma1), tuple(self.__Gamma2),
+                              noise, batch, moments, sparse, fillRatio, tol, precision, self.__partition)
+
 ##### Public Functions #####
-    def getState(self): return self.__state
+    def getState(self):
+        # return a Qobj, or a list of Qobj in batch mode
+        self.run() # apply the pending gates in lazy mode
+        if(self.__method == 'trajectory'):
+            # average of |psi><psi| over trajectories
+            return Qobj(self.__psi.T @ np.conj(self.__psi) / self.__psi.shape[0], dims=self.__dims)
+        elif(self.__method == 'statevector'):
+            rho_list = [Qobj(np.outer(psi, np.conj(psi)), dims=self.__dims) for psi in self.__state]
+            return rho_list[0] if (self.__batch is None) else rho_list
+        elif(self.__sparse):
+            return Qobj(self.__state, dims=self.__dims)
+
+        state = self.__state.full() if self.__partition else self.__state
+        if(self.__batch is None):
+            return Qobj(state[0], dims=self.__dims)
+        else:
+            return [Qobj(rho, dims=self.__dims) for rho in state]
+
+    def getCircuit(self): return self.__circuit
+
+    def isSparse(self): return self.__sparse
+
+    def getBlocks(self):
+        # return list of the qubit groups (sorted list of qubit index) tracked as separate blocks
+        self.run() # apply the pending gates in lazy mode
+        if(not self.__partition):
+            return [list(self.__qubits)]
+        return sorted([sorted([self.__qubits[n] for n in qubits]) for (qubits, rho) in self.__state.getBlocks()])
+
+    def getMethod(self): return self.__method
+
+    def getDrift(self):
+        # return the numerical drift of the states (maximum over batch), as a dict:
+        #   'trace'       - | Tr(rho) - 1 | (or | <psi|psi> - 1 | for state vectors)
+        #   'hermiticity' - max | rho - rho^dag | (always 0 for state vectors)
+        self.run() # apply the pending gates in lazy mode
+        if(self.__method in ['trajectory', 'statevector']):
+            psi  = self.__psi if (self.__method == 'trajectory') else self.__state
+            norm = np.sum(np.abs(psi.astype(np.complex128)) ** 2, axis=1)
+            return {'trace': float(np.max(np.abs(norm - 1))), 'hermiticity': 0.0}
+        elif(self.__sparse):
+            rho = self.__state.astype(np.complex128)
+            return {'trace': float(abs(rho.diagonal().sum() - 1)), 'hermiticity': float(abs(rho - rho.conj().T).max())}
+        elif(self.__memmap or self.__sharded):
+            (trace, herm) = OutOfCore.drift(self.__state)
+            return {'trace': float(np.max(np.abs(trace - 1))), 'hermiticity': herm}
+        elif(self.__partition):
+            # the trace is the product of the traces of blocks
+            trace = np.ones(1, dtype=np.complex128)
+            herm  = 0.0
+            for (qubits, rho) in self.__state.getBlocks():
+                rho   = rho.astype(np.complex128)
+                trace = trace * np.trace(rho, axis1=1, axis2=2)
+                herm  = max(herm, float(np.max(np.abs(rho - np.conj(np.swapaxes(rho, -1, -2))))))
+            return {'trace': float(np.max(np.abs(trace - 1))), 'hermiticity': herm}
+        else:
+            rho   = self.__state.astype(np.complex128)
+            trace = np.trace(rho, axis1=1, axis2=2)
+            return {'trace': float(np.max(np.abs(trace - 1))), 'hermiticity': float(np.max(np.abs(rho - np.conj(np.swapaxes(rho, -1, -2)))))}
+
+    def run(self):
+        # apply the recorded gates, where adjacent single qubit gates on the same qubit are fused into one gate
+        if(len(self.__circuit) == 0): return
+
+        ops = self.__circuit.getOperations()
+        self.__circuit.clear()
+        if(self.__prefixCache is None):
+            self.__Execute(ops)
+        else:
+            self.__ExecuteCached(ops)
 
     def u1(self, lamb, qubit):
         # check if input is legal
         self.__isLegal(qubit)
-        if(not isinstance(lamb, int) and not isinstance(lamb, float)): raise ERROR("Value of lambda should be integer or float")
-        
-        # set operator
-        operator = self.__I_list.copy()
-        operator[qubit - self.__Q_min] = (basis(2,1) * basis(2,1).dag() 
-                                            + np.exp(1.0j * lamb) * basis(2,0) * basis(2,0).dag()
-                                        )
+        lamb = self.__Parameter(lamb, 'lambda')
 
-        self.__ApplyGate(tensor(operator), self.__Time('u1', qubit))
+        self.__AddGate('u1', (lamb,), [qubit], self.__Time('u1', qubit))
 
     def u2(self, phi, lamb, qubit):
         # check if input is legal
         self.__isLegal(qubit)
-        if(not isinstance(phi,  int) and not isinstance(phi,  float)): raise ERROR("Value of phi should be integer or float")
-        if(not isinstance(lamb, int) and not isinstance(lamb, float)): raise ERROR("Value of lambda should be integer or float")
-        
-        # set operator
-        operator = self.__I_list.copy()
-        operator[qubit - self.__Q_min] = np.sqrt(0.5) * (
-                                            basis(2,1) * basis(2,1).dag() 
-                                            + np.exp(1.0j * (phi + lamb)) * basis(2,0) * basis(2,0).dag()
-                                            - np.exp(1.0j * lamb) * basis(2,1) * basis(2,0).dag()
-                                            + np.exp(1.0j * phi)  * basis(2,0) * basis(2,1).dag()
-                                        )
-
-        self.__ApplyGate(tensor(operator), self.__Time('u2', qubit))
+        phi  = self.__Parameter(phi,  'phi')
+        lamb = self.__Parameter(lamb, 'lambda')
+
+        self.__AddGate('u2', (phi, lamb), [qubit], self.__Time('u2', qubit))
 
     def u3(self, theta, phi, lamb, qubit):
         # check if input is legal
         self.__isLegal(qubit)
-        if(not isinstance(theta, int) and not isinstance(theta, float)): raise ERROR("Value of theta should be integer or float")
-        if(not isinstance(phi,   int) and not isinstance(phi,   float)): raise ERROR("Value of phi should be integer or float")
-        if(not isinstance(lamb,  int) and not isinstance(lamb,  float)): raise ERROR("Value of lambda should be integer or float")
-        
-        # set operator
-        operator = self.__I_list.copy()
-        operator[qubit - self.__Q_min] = (np.cos(theta / 2.) * basis(2,1) * basis(2,1).dag() 
-                                        + np.exp(1.0j * (phi + lamb)) * np.cos(theta / 2.) * basis(2,0) * basis(2,0).dag()
-                                        - np.exp(1.0j * lamb) * np.sin(theta / 2.) * basis(2,1) * basis(2,0).dag()
-                                        + np.exp(1.0j * phi)  * np.sin(theta / 2.) * basis(2,0) * basis(2,1).dag()
-                                    )
-
-        self.__ApplyGate(tensor(operator), self.__Time('u3', qubit))
+        theta = self.__Parameter(theta, 'theta')
+        phi   = self.__Parameter(phi,   'phi')
+        lamb  = self.__Parameter(lamb,  'lambda')
+
+        self.__AddGate('u3', (theta, phi, lamb), [qubit], self.__Time('u3', qubit))
 
     def cx(self, control, target):
         # check if input is legal
@@ -137,24 +336,11 @@ class QuantumNoiseSimulator:
         self.__isLegal(target)
         if(control == target): raise ERROR('Control and Target qubit index should be different')
 
-        # set operator
-        down_list = self.__I_list.copy()
-        down_list[control - self.__Q_min] = self.__down
-
-        up_list = self.__I_list.copy()
-        up_list[control - self.__Q_min] = self.__up
-
-        sx_list = self.__I_list.copy()
-        sx_list[target - self.__Q_min]  = self.__sx
-
-        operator = tensor(down_list) + tensor(up_list) * tensor(sx_list)
-
-        self.__ApplyGate(operator, self.__Time('cx', control, target))
+        self.__AddGate('cx', (), [control, target], self.__Time('cx', control, target))
 
     def iden(self, qubit):
-        self.__isLegal(qubit)            # check if input is legal
-        operator = self.__I_list.copy()  # set operator
-        self.__ApplyGate(tensor(operator), self.__Time('id', qubit))
+        self.__isLegal(qubit)  # check if input is legal
+        self.__AddGate('id', (), [qubit], self.__Time('id', qubit))
 
     def x(self, qubit):
         self.u3(np.pi, 0, np.pi, qubit)
@@ -185,79 +371,365 @@ class QuantumNoiseSimulator:
         self.__isLegal(control)
         self.__isLegal(target)
         if(control == target): raise ERROR('Control and target qubit should be different')
-        if(not isinstance(theta, int) and not isinstance(theta, float)): raise ERROR("Value of theta should be integer or float")
-        if(not isinstance(phi,   int) and not isinstance(phi,   float)): raise ERROR("Value of phi should be integer or float")
-        if(not isinstance(lamb,  int) and not isinstance(lamb,  float)): raise ERROR("Value of lambda should be integer or float")
-
-        # set operator
-        down_list = self.__I_list.copy()
-        down_list[control - self.__Q_min] = self.__down
-
-        up_list = self.__I_list.copy()
-        up_list[control - self.__Q_min] = self.__up
-
-        u3_list = self.__I_list.copy()
-        u3_list[target - self.__Q_min] = (np.cos(theta / 2.) * basis(2,1) * basis(2,1).dag() 
-                                            + np.exp(1.0j * (phi + lamb)) * np.cos(theta / 2.) * basis(2,0) * basis(2,0).dag()
-                                            - np.exp(1.0j * lamb) * np.sin(theta / 2.) * basis(2,1) * basis(2,0).dag()
-                                            + np.exp(1.0j * phi)  * np.sin(theta / 2.) * basis(2,0) * basis(2,1).dag()
-                                        )
-
-        operator = tensor(down_list) + tensor(up_list) * tensor(u3_list)
+        theta = self.__Parameter(theta, 'theta')
+        phi   = self.__Parameter(phi,   'phi')
+        lamb  = self.__Parameter(lamb,  'lambda')
 
         # set Gate operation time
         # since cu3 operation can be decompose into three single qubit operation and two CNOT operation
         time = 3 * self.__Time('u3', target) + 2 * self.__Time('cx', control, target)
 
-        self.__ApplyGate(operator, time)
+        self.__AddGate('cu3', (theta, phi, lamb), [control, target], time)
+
+    def loadQiskit(self, circuit, qubits=None):
+        # apply (or record in lazy mode) the gates of a qiskit QuantumCircuit
+        # qubits: list of qubit index which the circuit qubits are mapped onto [Default as None: the first simulated qubits]
+        if(qubits is None):
+            qubits = self.__qubits[:circuit.num_qubits]
+        if(not isinstance(qubits, list) or (len(qubits) != circuit.num_qubits)):
+            raise ERROR("qubits should be a list with " + str(circuit.num_qubits) + " qubit index")
+        for q in qubits:
+            self.__isLegal(q)
+
+        for (name, params, idx) in self.__importer.lower(circuit):
+            getattr(self, name)(*params, *[qubits[j] for j in idx])
 
     def measure(self, qubit):
-        qubit_list = []
-        # check if qubit is legal
-        if(isinstance(qubit, int)):
-            self.__isLegal(qubit)
-            qubit_list.append(qubit - self.__Q_min)
-        elif(isinstance(qubit, list)):
-            for q in qubit:
+        # return probability dict, with binary string keys (the values are arrays in batch mode)
+        return self.measureSubsets([qubit])[0]
+
+    def measureSubsets(self, subsets):
+        # return list of probability dicts for each subset of qubits, where the diagonal of the state is read only once
+        qubit_lists = [self.__QubitList(qubit) for qubit in subsets]
+        prob_list   = self.__Marginals(qubit_lists)
+
+        result = []
+        for (qubits, prob) in zip(qubit_lists, prob_list):
+            keys = Measurement.bitstrings(len(qubits))
+            result.append({keys[j]: (prob[0, j] if (self.__batch is None) else prob[:, j]) for j in range(len(keys))})
+        return result
+
+    def expect(self, paulis, qubits=None):
+        # return expectation values of Pauli strings (e.g. 'XIZ'), as an array with length P (or B x P in batch mode)
+        # paulis: a Pauli string or list of P Pauli strings
+        # qubits: list of qubit index for each character of the strings [Default as None: all of the simulated qubits]
+        qubits = list(self.__qubits) if (qubits is None) else qubits
+        if(not isinstance(qubits, list) or (len(set(qubits)) != len(qubits))): raise ERROR("qubits should be a list of different qubit index")
+        for q in qubits:
+            self.__isLegal(q)
+
+        self.run() # apply the pending gates in lazy mode
+        if(self.__partition):
+            result = self.__state.expectation([paulis] if isinstance(paulis, str) else paulis, self.__Internal(qubits))
+        else:
+            positions = [self.__N - 1 - n for n in self.__Internal(qubits)]
+            result    = Pauli.expectation(self.__Gather, [paulis] if isinstance(paulis, str) else paulis, positions, self.__N)
+
+        if(self.__batch is None): result = result[0]
+        return result[..., 0] if isinstance(paulis, str) else result
+
+    def sample(self, shots, seed=None, qubits=None):
+        # return dict of counts, with binary string keys (the values are arrays in batch mode)
+        # seed: seed of the random number generator [Default as None: unseeded]
+        # qubits: an integer or list of integer [Default as None: all of the qubits]
+        if(not isinstance(shots, int) or (shots <= 0)): raise ERROR("shots should be a positive integer")
+        qubits = self.__QubitList(list(self.__qubits) if (qubits is None) else qubits)
+
+        prob   = self.__Marginals([qubits])[0]
+        counts = Measurement.sample(prob, shots, np.random.default_rng(seed))
+        keys   = Measurement.bitstrings(len(qubits))
+        return {keys[j]: (int(counts[0, j]) if (self.__batch is None) else counts[:, j]) for j in range(len(keys))}
+
+    def gradient(self, objective, qubits=None, positions=None):
+        # return (value, gradient) of a linear objective after the recorded gates (lazy mode), with the parameter-shift rule
+        # objective: dict of {bitstring: weight} for sum(weight * probability) of measure(qubits), or
+        #            a Pauli string (or dict of {Pauli string: coefficient}) for sum(coefficient * expect(Pauli string, qubits))
+        # qubits: an integer or list of integer for bitstrings, list of qubit index for Pauli strings [Default as None: all of the qubits]
+        # positions: list of positions (in getCircuit()) of the u1, u2, u3, and cu3 gates to differentiate [Default as None: all of them]
+        # gradient: list with a tuple of partial derivatives (for each parameter) of each recorded operation,
+        #           which is empty if the operation is not differentiated
+        # All of the shifted circuits are evolved as one batch, where each of them starts from a copy of the unshifted state
+        # right before the step of its gate, so the common prefix is simulated only once. The recorded gates are not applied.
+        if(not self.__lazy): raise ERROR("gradient requires the recorded gates (lazy mode)")
+        if((self.__method not in ['density', 'statevector']) or self.__sparse or self.__partition or self.__memmap or self.__sharded or (self.__batch is not None)):
+            raise ERROR("gradient only supports the dense 'density' and 'statevector' methods without batch")
+
+        # check the objective: sum of weights of bitstrings, or coefficients of Pauli strings
+        objective = {objective: 1.0} if isinstance(objective, str) else objective
+        if(not isinstance(objective, dict) or (len(objective) == 0)):
+            raise ERROR("objective should be a Pauli string, or a dict of bitstrings or Pauli strings with weights")
+        strings = list(objective)
+        weights = np.array([objective[key] for key in strings], dtype=float)
+        if(all([isinstance(key, str) and (set(key) <= set('01')) for key in strings])):
+            qubit_list = self.__QubitList(list(self.__qubits) if (qubits is None) else qubits)
+            keys       = Measurement.bitstrings(len(qubit_list))
+            if(any([key not in keys for key in strings])): raise ERROR("bitstrings should have length " + str(len(qubit_list)))
+            bits       = [keys.index(key) for key in strings]
+            evaluate   = lambda: Measurement.marginals(self.__Diagonal(), [qubit_list], self.__N)[0][:, bits] @ weights
+        else:
+            qubits = list(self.__qubits) if (qubits is None) else qubits
+            if(not isinstance(qubits, list) or (len(set(qubits)) != len(qubits))): raise ERROR("qubits should be a list of different qubit index")
+            for q in qubits:
                 self.__isLegal(q)
-                qubit_list.append(q - self.__Q_min)
-        else: raise ERROR('Qubit should be an integer or list of integer')
-        
-        # set probability dict, with binary string keys
-        prob = {}
-        meas_state = self.__state.ptrace(qubit_list)
-        for j in range(2 ** len(qubit_list)):
-            prob[('{:0' + str(len(qubit_list)) + 'b}').format(j)] = meas_state[2 ** len(qubit_list) - j - 1, 2 ** len(qubit_list) - j - 1].real
-
-        return prob
+            paulipos   = [self.__N - 1 - n for n in self.__Internal(qubits)]
+            evaluate   = lambda: Pauli.expectation(self.__Gather, strings, paulipos, self.__N) @ weights
+
+        # check the gates to differentiate
+        ops = self.__circuit.getOperations()
+        if(positions is None):
+            positions = [pos for (pos, op) in enumerate(ops) if op[0] in ['u1', 'u2', 'u3', 'cu3']]
+        for pos in positions:
+            if(not isinstance(pos, int) or (pos < 0) or (pos >= len(ops)) or (ops[pos][0] not in ['u1', 'u2', 'u3', 'cu3'])):
+                raise ERROR("positions should be a list of positions of the u1, u2, u3, and cu3 gates in the circuit")
+
+        # shifted circuits: (position, parameter index, shift, coefficient) for each member of batch (except the unshifted 0-th one)
+        positions = sorted(set(positions))
+        terms     = [(pos, p, shift, coefficient) for pos in positions for p in range(len(ops[pos][1]))
+                     for (shift, coefficient) in Gates.shiftRule(ops[pos][0], p)]
+        K         = 1 + len(terms)
+
+        # the parameters of the differentiated gates become arrays over the batch
+        ops = list(ops)
+        for pos in positions:
+            (name, params, targets, time) = ops[pos]
+            params = [np.full(K, value) for value in params]
+            for (k, (pos_k, p, shift, coefficient)) in enumerate(terms, 1):
+                if(pos_k == pos): params[p][k] += shift
+            ops[pos] = (name, tuple(params), targets, time)
+
+        # the members of batch start at the step of their gates
+        (program, sources) = self.__Program(ops)
+        step   = {pos: n for (n, source) in enumerate(sources) for pos in source}
+        starts = [[k for k in range(1, K) if step[terms[k - 1][0]] == n] for n in range(len(program))]
+
+        state = self.__state
+        try:
+            self.__state = state.copy()
+            active = [0]
+            for ((gates, time), start) in zip(program, starts):
+                if(len(start) > 0):
+                    self.__state = np.concatenate([self.__state, np.repeat(self.__state[:1], len(start), axis=0)])
+                    active += start
+                for (operator, targets) in gates:
+                    self.__ApplyUnitary(operator if (np.ndim(operator) != 3) else operator[active], targets)
+                self.__ApplyNoise(time)
+
+            values = np.zeros(K)
+            values[active] = evaluate()
+        finally:
+            self.__state = state
+
+        gradient = [[0.0] * len(op[1]) if (pos in positions) else [] for (pos, op) in enumerate(ops)]
+        for (k, (pos, p, shift, coefficient)) in enumerate(terms, 1):
+            gradient[pos][p] += coefficient * values[k]
+        return (float(values[0]), [tuple(g) for g in gradient])
 
     #def GeneralGate(self):pass
 
 ##### Private Functions #####
     # Check if the qubit is legaltlist = np.linspace(0, self.__GateTime[gateName], self.__GateTime[gateName])
     def __isLegal(self, qubit):
-        if(not isinstance(qubit, int) or (qubit < self.__Q_min) or (qubit > self.__Q_max)):
-            raise ERROR("Qubit Index should be between " + str(self.__Q_min) + " and " + str(self.__Q_max))
+        if(not isinstance(qubit, int) or (qubit not in self.__index)):
+            if(self.__qubits == list(range(self.__qubits[0], self.__qubits[-1] + 1))):
+                raise ERROR("Qubit Index should be between " + str(self.__qubits[0]) + " and " + str(self.__qubits[-1]))
+            raise ERROR("Qubit Index should be one of " + str(self.__qubits))
+
+    # Check if the gate parameter is legal, and convert it into float (or array of float in batch mode)
+    def __Parameter(self, value, name):
+        if(isinstance(value, int) or isinstance(value, float)):
+            return float(value)
+        if((self.__batch is not None) and isinstance(value, (list, tuple, np.ndarray))):
+            value = np.asarray(value, dtype=float)
+            if(value.shape == (self.__batch,)): return value
+        if(self.__batch is None):
+            raise ERROR("Value of " + name + " should be integer or float")
+        else:
+            raise ERROR("Value of " + name + " should be integer, float, or an array with length " + str(self.__batch))
 
-    def __Time(self, gateName, control, target=None):
-        # single qubit gate
-        if(target == None):
-            gateID = gateName + '_' + str(control)
-        
-        # two qubit gate
+    # Check if the qubit (integer or list of integer) is legal, and return the sorted list of internal index
+    def __QubitList(self, qubit):
+        if(isinstance(qubit, int)):
+            qubit = [qubit]
+        elif(not isinstance(qubit, list)):
+            raise ERROR('Qubit should be an integer or list of integer')
+        for q in qubit:
+            self.__isLegal(q)
+
+        return sorted(set(self.__Internal(qubit)))
+
+    # Return the B x U x 2^N array of rho[k, k ^ xmask] for each of the U xmasks
+    def __Gather(self, xmask):
+        k   = np.arange(2 ** self.__N)
+        idx = k[None, :] ^ xmask[:, None]
+        if(self.__method == 'trajectory'):
+            # average over trajectories for each xmask, so the temporary array is only as large as the trajectories
+            result = np.zeros((1,) + idx.shape, dtype=self.__psi.dtype)
+            for (u, row) in enumerate(idx):
+                result[0, u] = np.einsum('tk,tk->k', self.__psi, np.conj(self.__psi[:, row])) / self.__psi.shape[0]
+            return result
+        elif(self.__method == 'statevector'):
+            return self.__state[:, None, :] * np.conj(self.__state[:, idx])
+        elif(self.__sparse):
+            return np.reshape(np.asarray(self.__state[np.broadcast_to(k, idx.shape).ravel(), idx.ravel()]), (1,) + idx.shape)
         else:
-            gateID = gateName + str(control) + "_" + str(target)
+            return self.__state[:, k[None, :], idx]
+
+    # Return the diagonal of the states: B x 2^N array
+    def __Diagonal(self):
+        if(self.__method == 'trajectory'):
+            return np.mean(np.abs(self.__psi) ** 2, axis=0, keepdims=True)
+        elif(self.__method == 'statevector'):
+            return np.abs(self.__state) ** 2
+        elif(self.__sparse):
+            return np.real(self.__state.diagonal())[None, :]
+        else:
+            return np.real(np.diagonal(self.__state, axis1=1, axis2=2))
+
+    # Return list of marginal probabilities (B x 2^k arrays) for each sorted list of internal qubit index
+    def __Marginals(self, qubit_lists):
+        self.run() # apply the pending gates in lazy mode
+        if(self.__partition):
+            return self.__state.marginals(qubit_lists)
+        return Measurement.marginals(self.__Diagonal(), qubit_lists, self.__N)
+
+    def __Time(self, gateName, control, target=None):
+        # look up the gate table by (gate name, qubit tuple)
+        qubits = (control,) if (target is None) else (control, target)
+        time   = self.__GateTable.getTime(gateName, qubits)
 
         # check if the gate exsist
-        if gateID not in self.__GateTime:
-            raise ERROR("The gate '" + gateID + "' doesn't exist in the device.")
+        if np.isnan(time):
+            raise ERROR("The gate '" + gateName + ''.join(['_' + str(q) for q in qubits]) + "' doesn't exist in the device.")
+        else:
+            return float(time)
+
+    # Return the program of the list of operations (name, params, qubits, time) with gate fusion (and moments):
+    # list of (gates, time), where the noise of the given time is applied after the gates,
+    # and the list of positions of the operations in each step of the program
+    def __Program(self, ops):
+        if(self.__moments):
+            (layers, sources) = Circuit(ops).moments(index=True)
+            program = [
+                ([(Gates.matrix(name, params), self.__Internal(qubits)) for (name, params, qubits, time) in layer], max([op[3] for op in layer]))
+                for layer in layers
+            ]
+        else:
+            (fused, sources) = Circuit(ops).fuse(index=True)
+            program = [
+                ([(Gates.matrix(name, params), self.__Internal(qubits))], time)
+                for (name, params, qubits, time) in fused
+            ]
+        return (program, sources)
+
+    # Apply the list of operations (name, params, qubits, time) with gate fusion (and moments)
+    def __Execute(self, ops):
+        self.__Run(self.__Program(ops)[0])
+
+    # Apply the program: list of (gates, time)
+    def __Run(self, program):
+        if(self.__sharded):
+            # send the whole program to the workers, so that the operations inside the shards are applied in few rounds
+            ops = []
+            for (gates, time) in program:
+                ops += [('gate', operator, qubits) for (operator, qubits) in gates if (operator is not None)]
+                ops += [('channel', kraus_list, n) for (n, kraus_list) in self.__Kraus.getChannels(time)]
+            self.__Shards.apply(ops)
+        elif(self.__method == 'trajectory'):
+            self.__psi = runTrajectories(self.__psi, program, self.__Gamma1, self.__Gamma2, self.__processes, self.__seed.spawn(1)[0])
+        else:
+            for (gates, time) in program:
+                for (operator, qubits) in gates:
+                    self.__ApplyUnitary(operator, qubits)
+                self.__ApplyNoise(time)
+
+    # Apply the list of operations with the prefix cache, where the program of the whole run is built first,
+    # and the states are stored (and looked up) only between its steps, so the result does not depend on the cache
+    def __ExecuteCached(self, ops):
+        (program, sources) = self.__Program(ops)
+        keys   = [tuple([PrefixCache.key(ops[pos]) for pos in source]) for source in sources]
+        stride = self.__prefixCache.getStride()
+
+        # resume from the deepest stored prefix
+        (depth, state) = self.__prefixCache.lookup(self.__config, self.__history + keys)
+        if(depth > len(self.__history)):
+            skip = depth - len(self.__history)
+            self.__state  = state
+            self.__sparse = issparse(state)
+            self.__history += keys[:skip]
+            (program, keys) = (program[skip:], keys[skip:])
+
+        # apply the steps in chunks ending at the multiples of stride (or the last step), and store the state after each chunk
+        while(len(program) > 0):
+            n = stride - (len(self.__history) % stride)
+            self.__Run(program[:n])
+            self.__history += keys[:n]
+            (program, keys) = (program[n:], keys[n:])
+            self.__prefixCache.store(self.__config, self.__history, self.__state)
+
+    # Record the gate in lazy mode, otherwise apply it immediately
+    def __AddGate(self, name, params, qubits, time):
+        if(self.__lazy):
+            self.__circuit.append(name, params, qubits, time)
         else:
-            return self.__GateTime[gateID]
+            self.__ApplyGate(Gates.matrix(name, params), self.__Internal(qubits), time)
 
-    # Apply gates on states with Lindblad Master Equation
-    def __ApplyGate(self, operator, time):
-        tlist = np.linspace(0, time, int(time))
-        self.__state = operator * self.__state * operator.dag()
+    # Convert the qubit index into the internal one (from 0 to N - 1)
+    def __Internal(self, qubits):
+        return [self.__index[q] for q in qubits]
 
-        result = mesolve(self.__H, self.__state, tlist, self.__c_op_list, options = self.__ODEoption)
-        self.__state = result.states[-1]
\ No newline at end of file
+    # Apply gates on states with Lindblad Master Equation
+    def __ApplyGate(self, operator, qubits, time):
+        self.__ApplyUnitary(operator, qubits)
+        self.__ApplyNoise(time)
+
+    # Apply the gate only on the axes of the given (internal) qubits (identity gate if operator is None)
+    def __ApplyUnitary(self, operator, qubits):
+        if(operator is None):
+            return
+        elif(self.__method == 'statevector'):
+            self.__state = applyGateVector(self.__state, operator, qubits, self.__N)
+        elif(self.__sparse):
+            self.__state = Sparse.applyGate(self.__state, operator, qubits, self.__N)
+            self.__CheckFill()
+        elif(self.__partition):
+            self.__state.applyGate(operator, qubits)
+        elif(self.__memmap):
+            self.__state = OutOfCore.applyGate(self.__state, operator, qubits, self.__N)
+        elif(self.__sharded):
+            self.__Shards.apply([('gate', operator, qubits)])
+        else:
+            self.__state = applyGate(self.__state, operator, qubits, self.__N)
+
+    # Evolve the state with the noise engine for the given time
+    def __ApplyNoise(self, time):
+        # no noise for state vectors
+        if(self.__method == 'statevector'):
+            return
+
+        # apply the cached propagator on the vectorized density matrix
+        if(self.__noise == 'propagator'):
+            self.__state = self.__Propagator.evolve(self.__state, time)
+
+        # apply the local Kraus maps of each qubit (by the workers on their shards)
+        elif(self.__sharded):
+            self.__Shards.apply([('channel', kraus_list, n) for (n, kraus_list) in self.__Kraus.getChannels(time)])
+        elif(self.__noise == 'kraus'):
+            self.__state = self.__Kraus.evolve(self.__state, time)
+            if(self.__sparse): self.__CheckFill()
+
+        # apply the action of exp(L * t) with the truncated Taylor series
+        elif(self.__noise == 'taylor'):
+            self.__state = self.__Taylor.evolve(self.__state, time)
+
+        # integrate the master equation
+        else:
+            tlist = np.linspace(0, time, int(time))
+            for b in range(self.__state.shape[0]):
+                result = mesolve(self.__H, Qobj(self.__state[b], dims=self.__dims), tlist, self.__c_op_list, options = self.__ODEoption)
+                self.__state[b] = result.states[-1].full().astype(self.__dtype)
+
+    # Switch the sparse state into dense array when it is filled in
+    def __CheckFill(self):
+        if(Sparse.fillRatio(self.__state) > self.__fillRatio):
+            self.__state  = self.__state.toarray()[None, :, :]
+            self.__sparse = False
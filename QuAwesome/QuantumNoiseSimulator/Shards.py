@@ -0,0 +1,132 @@
+# This code is part of QuAwesome.
+#
+#    MIT License
+#
+#    Copyright (c) 2020 and later, Yi-Te Huang
+#
+#    Permission is hereby granted, free of charge, to any person obtaining a copy
+#    of this software and associated documentation files (the "Software"), to deal
+#    in the Software without restriction, including without limitation the rights
+#    to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#    copies of the Software, and to permit persons to whom the Software is
+#    furnished to do so, subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be included in all
+#    copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#    IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#    FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#    LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#    OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#    SOFTWARE.
+#######################################################################################
+from QuAwesome import QuAwesomeError as ERROR
+from QuAwesome.QuantumNoiseSimulator import OutOfCore
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+import weakref
+
+# the density matrices attached in each worker process (name of shared memory -> (SharedMemory, array))
+ATTACHED = {}
+
+def attach(name, shape, dtype):
+    """
+    Attach the density matrices in the shared memory with the given name (in a worker process) \n
+    Inputs:
+        name  - name of the shared memory
+        shape - shape of the density matrices (B, 2^N, 2^N)
+        dtype - data type of the density matrices
+    """
+    shm = shared_memory.SharedMemory(name=name)
+    ATTACHED[name] = (shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf))
+
+def runShard(name, ops, N, part, parts):
+    """
+    Apply the list of operations on the given part of the density matrices in the shared memory (in a worker process) \n
+    Inputs:
+        name  - name of the shared memory
+        ops   - list of ('gate', U, qubits) or ('channel', kraus_list, qubit)
+        N     - total qubit number
+        part  - index of the part (shard)
+        parts - number of parts
+    """
+    rho = ATTACHED[name][1]
+    for (kind, operator, qubits) in ops:
+        if(kind == 'gate'):
+            OutOfCore.applyGate(rho, operator, qubits, N, part=part, parts=parts)
+        else:
+            OutOfCore.applyChannel(rho, operator, qubits, N, part=part, parts=parts)
+
+class ShardedState:
+    def __init__(self, N, B=1, dtype=complex, processes=2):
+        """
+        Density matrices of N qubits in shared memory, sharded by the high-order qubits across worker processes.
+        The rows of the density matrices are split into 2^s shards (s = log2(processes)) by the first s (internal) qubits,
+        and each worker applies the gates and noise on its own shard. The operations which do not act on the first s qubits
+        stay in the shards, so a run of them is applied in one round without synchronization. An operation acting on them
+        mixes the rows across shards, and it is applied in a round of its own, where each worker processes a disjoint
+        part of the row groups (read and written in place through the shared memory, in place of swapping the qubits).
+        The initial state is |0...0><0...0| with basis(2,1) as |0> (the last element in the basis of qutip).
+
+        Inputs:
+            N         - total qubit number
+            B         - [Default as 1] batch size
+            dtype     - [Default as complex] data type of the density matrices
+            processes - [Default as 2] number of worker processes (shards), should be a power of 2
+
+        Functions
+            - getArray():
+                return the B x 2^N x 2^N density matrices (a view of the shared memory)
+            - apply(ops):
+                apply the list of operations ('gate', U, qubits) or ('channel', kraus_list, qubit) in order
+            - close():
+                shut down the workers and release the shared memory
+        """
+        if(not isinstance(processes, int) or (processes < 1) or (processes & (processes - 1)) or (processes > 2 ** N)):
+            raise ERROR("processes should be a power of 2, and not larger than 2^N")
+
+        self.__N      = N
+        self.__parts  = processes
+        self.__shards = processes.bit_length() - 1 # number of high-order qubits labeling the shards
+        shape = (B, 2 ** N, 2 ** N)
+
+        self.__shm = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)) * np.dtype(dtype).itemsize)
+        self.__rho = np.ndarray(shape, dtype=dtype, buffer=self.__shm.buf)
+        self.__rho[:] = 0
+        self.__rho[:, -1, -1] = 1.0
+
+        self.__pool = ProcessPoolExecutor(max_workers=processes, initializer=attach, initargs=(self.__shm.name, shape, np.dtype(dtype)))
+        self.__finalizer = weakref.finalize(self, ShardedState.__Release, self.__pool, self.__shm)
+
+    def getArray(self): return self.__rho
+
+    def apply(self, ops):
+        # split the operations into rounds, where a run of operations inside the shards forms one round
+        rounds = []
+        for op in ops:
+            qubits = op[2] if isinstance(op[2], (list, tuple)) else [op[2]]
+            local  = all([q >= self.__shards for q in qubits])
+            if(local and (len(rounds) > 0) and rounds[-1][0]):
+                rounds[-1][1].append(op)
+            else:
+                rounds.append((local, [op]))
+
+        for (local, round_ops) in rounds:
+            futures = [self.__pool.submit(runShard, self.__shm.name, round_ops, self.__N, part, self.__parts) for part in range(self.__parts)]
+            for future in futures:
+                future.result()
+
+    def close(self):
+        self.__finalizer()
+
+    @staticmethod
+    def __Release(pool, shm):
+        pool.shutdown()
+        try:
+            shm.close()
+        except BufferError:
+            pass # the array is still referenced, the memory is released with it
+        shm.unlink()
@@ -0,0 +1,117 @@
+# This code is part of QuAwesome.
+#
+#    MIT License
+#
+#    Copyright (c) 2020 and later, Yi-Te Huang
+#
+#    Permission is hereby granted, free of charge, to any person obtaining a copy
+#    of this software and associated documentation files (the "Software"), to deal
+#    in the Software without restriction, including without limitation the rights
+#    to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#    copies of the Software, and to permit persons to whom the Software is
+#    furnished to do so, subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be included in all
+#    copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#    IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#    FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#    LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#    OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#    SOFTWARE.
+#######################################################################################
+from functools import lru_cache
+import numpy as np
+from scipy import sparse
+
+# Sparse (CSR) kernels acting on a single 2^N x 2^N density matrix.
+# The operators are embedded into the full space with the same ordering as qutip.tensor
+# (the first qubit is the most significant one).
+# The elements smaller than tolerance (e.g. cos(pi / 2) of the gates) are dropped, so that the number of stored
+# elements only counts the real fill-in. The default tolerance is 10 times the machine epsilon of the dtype.
+
+def tolerance(dtype):
+    return 10 * np.finfo(dtype).eps
+
+def prune(rho, tol=None):
+    """
+    Remove the elements of the sparse matrix with absolute value smaller than tol (in place), and return it \n
+    Inputs:
+        rho - sparse (CSR) matrix
+        tol - [Default as None: tolerance of the dtype] tolerance of the dropped elements
+    """
+    tol = tolerance(rho.dtype) if (tol is None) else tol
+    rho.data[np.abs(rho.data) < tol] = 0
+    rho.eliminate_zeros()
+    return rho
+
+@lru_cache(maxsize=256)
+def elementary(a, b, qubits, N):
+    """
+    Return the 2^N x 2^N sparse (CSR) operator |a><b| acting on the given qubits (identity on the others) \n
+    Inputs:
+        a, b   - index of the basis of the k qubits
+        qubits - tuple of (internal) qubit index, ordered as the tensor product of |a><b|
+        N      - total qubit number
+    """
+    k       = len(qubits)
+    factors = [sparse.identity(2, dtype=complex, format='csr') for n in range(N)]
+    for (m, q) in enumerate(qubits):
+        row = (a >> (k - 1 - m)) & 1
+        col = (b >> (k - 1 - m)) & 1
+        factors[q] = sparse.csr_matrix(([1.0 + 0.0j], ([row], [col])), shape=(2, 2))
+
+    op = factors[0]
+    for f in factors[1:]:
+        op = sparse.kron(op, f, format='csr')
+    return op
+
+def embed(U, qubits, N, tol=None):
+    """
+    Return the 2^N x 2^N sparse (CSR) operator of the gate U acting on the given qubits \n
+    Inputs:
+        U      - 2^k x 2^k matrix of the gate
+        qubits - list of (internal) qubit index which the gate acts on, ordered as the tensor product of U
+        N      - total qubit number
+        tol    - [Default as None: tolerance of complex128] the elements of U smaller than tol are skipped
+    """
+    U  = np.asarray(U)
+    op = sparse.csr_matrix((2 ** N, 2 ** N), dtype=complex)
+    for (a, b) in zip(*np.nonzero(np.abs(U) >= (tolerance(np.complex128) if (tol is None) else tol))):
+        op = op + U[a, b] * elementary(int(a), int(b), tuple(qubits), N)
+    return op
+
+def applyGate(rho, U, qubits, N):
+    """
+    Apply the gate U on the sparse density matrix: U * rho * U^dag \n
+    Inputs:
+        rho    - 2^N x 2^N sparse density matrix
+        U      - 2^k x 2^k matrix of the gate
+        qubits - list of (internal) qubit index which the gate acts on, ordered as the tensor product of U
+        N      - total qubit number
+    """
+    op = embed(U, qubits, N).astype(rho.dtype, copy=False)
+    return prune((op @ rho @ op.conj().T).tocsr())
+
+def applyChannel(rho, kraus_list, qubit, N):
+    """
+    Apply a single qubit channel, given by its 2 x 2 Kraus operators, on the sparse density matrix \n
+    Inputs:
+        rho        - 2^N x 2^N sparse density matrix
+        kraus_list - list of 2 x 2 Kraus operators
+        qubit      - the (internal) index of qubit, from 0 to N - 1
+        N          - total qubit number
+    """
+    result = sparse.csr_matrix(rho.shape, dtype=rho.dtype)
+    for K in kraus_list:
+        op     = embed(K, [qubit], N).astype(rho.dtype, copy=False)
+        result = result + op @ rho @ op.conj().T
+    return prune(result.tocsr())
+
+def fillRatio(rho):
+    """
+    Return the ratio of nonzero elements in the sparse density matrix
+    """
+    return rho.nnz / (rho.shape[0] * rho.shape[1])
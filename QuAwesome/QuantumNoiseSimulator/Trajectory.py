@@ -0,0 +1,106 @@
+# This code is part of QuAwesome.
+#
+#    MIT License
+#
+#    Copyright (c) 2020 and later, Yi-Te Huang
+#
+#    Permission is hereby granted, free of charge, to any person obtaining a copy
+#    of this software and associated documentation files (the "Software"), to deal
+#    in the Software without restriction, including without limitation the rights
+#    to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#    copies of the Software, and to permit persons to whom the Software is
+#    furnished to do so, subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be included in all
+#    copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#    IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#    FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#    LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#    OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#    SOFTWARE.
+#######################################################################################
+from QuAwesome.QuantumNoiseSimulator.Kernel import applyGateVector
+from QuAwesome.QuantumNoiseSimulator.Noise import KrausNoise
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+# Quantum trajectory (Monte Carlo wave function) method.
+# The noise of each gate is unraveled into stochastic jumps: for each qubit, one of the Kraus operators K_k of
+# its amplitude damping and dephasing channel (see KrausNoise) is chosen with probability || K_k * psi ||^2.
+# The average of |psi><psi| over trajectories reproduces the density matrix of the Lindblad Master Equation.
+#
+# A program is a list of steps: (gates, time), where gates is a list of (U, qubits) applied before
+# the noise of the given time. U can be None for the identity gate, and qubits are the internal qubit index.
+
+def applyJump(psi, kraus_list, qubit, N, rng):
+    """
+    Apply a stochastic jump, chosen from the 2 x 2 Kraus operators, on each state vector \n
+    Inputs:
+        psi        - B x 2^N state vectors (ndarray)
+        kraus_list - list of 2 x 2 Kraus operators
+        qubit      - the (internal) index of qubit, from 0 to N - 1
+        N          - total qubit number
+        rng        - numpy random generator
+    """
+    # candidate states and their probabilities
+    candidates = np.array([applyGateVector(psi, K, [qubit], N) for K in kraus_list])
+    prob       = np.sum(np.abs(candidates) ** 2, axis=2)
+
+    # choose one Kraus operator for each trajectory and normalize the state
+    cumulative = np.cumsum(prob, axis=0)
+    r          = rng.random(psi.shape[0]) * cumulative[-1]
+    choice     = np.minimum(np.sum(cumulative < r, axis=0), len(kraus_list) - 1)
+    idx        = np.arange(psi.shape[0])
+
+    return candidates[choice, idx] / np.sqrt(prob[choice, idx])[:, None]
+
+def evolveTrajectories(psi, program, Gamma1, Gamma2, seed=None):
+    """
+    Evolve the state vectors of trajectories with the given program \n
+    Inputs:
+        psi     - B x 2^N state vectors (ndarray)
+        program - list of steps (gates, time)
+        Gamma1  - list of Gamma1 of each qubit
+        Gamma2  - list of Gamma2 of each qubit
+        seed    - [Default as None] seed of the random generator
+    """
+    N     = len(Gamma1)
+    noise = KrausNoise(Gamma1, Gamma2)
+    rng   = np.random.default_rng(seed)
+
+    for (gates, time) in program:
+        for (U, qubits) in gates:
+            if(U is not None): psi = applyGateVector(psi, U, qubits, N)
+
+        for n in range(N):
+            if (Gamma1[n] > 0.0) or (Gamma2[n] > 0.0):
+                psi = applyJump(psi, noise.getKraus(n, time), n, N, rng)
+
+    return psi
+
+def runTrajectories(psi, program, Gamma1, Gamma2, processes=1, seed=None):
+    """
+    Evolve the state vectors of trajectories with the given program, where the trajectories are
+    split into chunks and run in parallel across processes \n
+    Inputs:
+        psi       - ntraj x 2^N state vectors (ndarray)
+        program   - list of steps (gates, time)
+        Gamma1    - list of Gamma1 of each qubit
+        Gamma2    - list of Gamma2 of each qubit
+        processes - [Default as 1] number of processes
+        seed      - [Default as None] seed (or numpy SeedSequence) of the random generators
+    """
+    if(not isinstance(seed, np.random.SeedSequence)): seed = np.random.SeedSequence(seed)
+    processes = max(1, min(processes, psi.shape[0]))
+    seeds     = seed.spawn(processes)
+    chunks    = np.array_split(psi, processes)
+
+    if(processes == 1):
+        return evolveTrajectories(psi, program, Gamma1, Gamma2, seeds[0])
+
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = [pool.submit(evolveTrajectories, chunk, program, Gamma1, Gamma2, s) for (chunk, s) in zip(chunks, seeds)]
+        return np.concatenate([f.result() for f in futures])
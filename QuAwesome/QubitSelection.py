@@ -0,0 +1,252 @@
+# This code is part of QuAwesome.
+#
+#    MIT License
+#
+#    Copyright (c) 2020 and later, Yi-Te Huang
+#
+#    Permission is hereby granted, free of charge, to any person obtaining a copy
+#    of this software and associated documentation files (the "Software"), to deal
+#    in the Software without restriction, including without limitation the rights
+#    to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#    copies of the Software, and to permit persons to whom the Software is
+#    furnished to do so, subject to the following conditions:
+#
+#    The above copyright notice and this permission notice shall be included in all
+#    copies or substantial portions of the Software.
+#
+#    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#    IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#    FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#    LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#    OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#    SOFTWARE.
+#######################################################################################
+from QuAwesome.exceptions import QuAwesomeError as ERROR
+from QuAwesome import Device
+import numpy as np
+import heapq
+
+def selectQubits(device, k, duration=0.0, gates1=0, edges=None, contiguous=True, gate2='cx', top=1):
+    """
+    Return the best placements of a circuit on k qubits on the device, as a list of (qubits, fidelity) sorted from the best,
+    where qubits[i] is the qubit index of the device for the relative qubit i of the circuit, and fidelity is the estimated
+    success probability:
+        exp(- sum_q [gates1 * -log(1 - e1(q)) + duration * (Gamma1(q) + Gamma2(q))] - sum_edges -log(1 - e2(edge)))
+    with the mean error e1(q) of the single qubit gates on q, and the error e2 of the two qubit gate (control, target)
+    on the placed qubits of each edge. The placements where any of the two qubit gates doesn't exist are excluded. \n
+    Inputs:
+        device     - a QuAwesome.Device with the gate errors and the two qubit gates (coupling graph)
+        k          - number of qubits
+        duration   - [Default as 0.0] duration of the circuit (with unit 'ns') for the T1 / T2 decay
+        gates1     - [Default as 0] number of single qubit gates on each qubit
+        edges      - [Default as None] list of (control, target) pairs of the relative qubit index (from 0 to k - 1)
+                     for each two qubit gate (repeated pairs are counted for each gate)
+        contiguous - [Default as True] search the windows [Q_min, Q_min + k - 1] (for QuantumNoiseSimulator), where the
+                     relative qubit i is placed on Q_min + i. If False, search all of the placements (for QuantumNoiseSimulator
+                     with the list of qubits), and return the best placement of each distinct set of qubits
+        gate2      - [Default as 'cx'] name of the two qubit gate
+        top        - [Default as 1] number of the best results to return
+    """
+    if(not isinstance(device, Device)): raise ERROR("The device should be an QuAwesome.Device type object")
+    N = device.getN()
+    if(not isinstance(k, int) or (k <= 0) or (k > N)): raise ERROR("k should be an integer between 1 and " + str(N))
+    if(not isinstance(top, int) or (top <= 0)): raise ERROR("top should be a positive integer")
+    edges = [] if (edges is None) else [(int(i), int(j)) for (i, j) in edges]
+    if(any([(i < 0) or (j < 0) or (i >= k) or (j >= k) or (i == j) for (i, j) in edges])):
+        raise ERROR("edges should be pairs of different relative qubit index between 0 and " + str(k - 1))
+
+    (node, edge) = qubitCosts(device, duration, gates1, gate2)
+
+    # windows: incremental (prefix) sums of the qubit costs, and the edge costs gathered for all windows at once
+    if(contiguous):
+        W     = N - k + 1
+        start = np.arange(W)
+        score = np.cumsum(np.concatenate([[0.0], node]))
+        score = score[start + k] - score[start]
+        for (i, j) in edges:
+            score = score + edge[start + i, start + j]
+
+        result = []
+        for s in np.argsort(score, kind='stable')[:top]:
+            if(np.isfinite(score[s])):
+                result.append((list(range(int(s), int(s) + k)), float(np.exp(- score[s]))))
+        return result
+
+    # placements: the connected components of the edges graph are ranked separately (lazily, in order of cost), and
+    # the combinations of their placements on disjoint qubits are searched in order of the total cost. The M isolated
+    # relative qubits (without edges) are interchangeable, and they are filled with the unused qubits
+    adjacency = [set() for i in range(k)]
+    for (i, j) in edges:
+        adjacency[i].add(j)
+        adjacency[j].add(i)
+    components = []
+    for root in range(k):
+        if((len(adjacency[root]) == 0) or any([root in comp for comp in components])): continue
+        (comp, queue) = ([root], [root])
+        while(len(queue) > 0):
+            for j in sorted(adjacency[queue.pop(0)] - set(comp)):
+                comp.append(j)
+                queue.append(j)
+        components.append(sorted(comp))
+    isolated = [i for i in range(k) if len(adjacency[i]) == 0]
+    M        = len(isolated)
+
+    # the components with the same (relabeled) edges share the ranked placements, and they are interchangeable,
+    # so the ranks of the members of each group are kept strictly increasing
+    groups = {} # (size, relabeled edges) -> (index of group, ranked placements, list of pulled placements)
+    member = [] # (index of group, position in group) of each component
+    for comp in components:
+        local = tuple([(comp.index(i), comp.index(j)) for (i, j) in edges if i in comp])
+        if((len(comp), local) not in groups):
+            groups[(len(comp), local)] = (len(groups), rankPlacements(node, edge, list(local), len(comp)), [])
+        member.append((groups[(len(comp), local)], sum([m[0] is groups[(len(comp), local)] for m in member])))
+
+    # return the r-th placement (cost, qubits) of the c-th component, or None if there is no more placement
+    def placement(c, r):
+        (_, ranked, pulled) = member[c][0]
+        while(len(pulled) <= r):
+            nxt = next(ranked, None)
+            if(nxt is None): return None
+            pulled.append(nxt)
+        return pulled[r]
+
+    # best-first search over the ranks of components (with the cheapest M qubits as the lower bound of the fill),
+    # and over the fills of the isolated qubits: a fill is the sorted index (in the sorted unused qubits) of M qubits,
+    # where the index from the frontier f can be increased
+    bound  = np.concatenate([[0.0], np.cumsum(np.sort(node))])
+    start  = tuple([position for (group, position) in member])
+    chosen = [placement(c, r) for (c, r) in enumerate(start)]
+    heap   = [] if (None in chosen) else [(sum([p[0] for p in chosen]) + bound[M], 0, start, None)]
+    count  = 1 # tie breaker of the heap
+    seen   = {start}
+    found  = set()
+    result = []
+    while((len(heap) > 0) and (len(result) < top)):
+        (priority, _, ranks, fill) = heapq.heappop(heap)
+
+        # complete placement (with the fill of the isolated qubits), and the next fills
+        if(fill is not None):
+            (cost, placed, unused, idx, f) = fill
+            qubits = dict(placed)
+            qubits.update(zip(isolated, [unused[j] for j in idx]))
+            if(frozenset(qubits.values()) not in found):
+                found.add(frozenset(qubits.values()))
+                result.append(([int(qubits[i]) for i in range(k)], float(np.exp(- cost))))
+            nexts = []
+            if((M > 0) and (idx[f] + 1 < (idx[f + 1] if (f + 1 < M) else len(unused)))):
+                nexts.append((idx[:f] + (idx[f] + 1,) + idx[f + 1:], f))
+            if((f > 0) and (idx[f - 1] + 1 < idx[f])):
+                nexts.append((idx[:f - 1] + (idx[f - 1] + 1,) + idx[f:], f - 1))
+            for (nidx, nf) in nexts:
+                ncost = cost + sum([node[unused[j]] for j in nidx]) - sum([node[unused[j]] for j in idx])
+                heapq.heappush(heap, (ncost, count, ranks, (ncost, placed, unused, nidx, nf)))
+                count += 1
+            continue
+
+        # combination of the placements of components: start the fills if they are on disjoint qubits
+        chosen = [placement(c, r) for (c, r) in enumerate(ranks)]
+        placed = [(i, q) for (comp, p) in zip(components, chosen) for (i, q) in zip(comp, p[1])]
+        used   = set([q for (i, q) in placed])
+        if(len(used) == len(placed)):
+            unused = tuple(sorted(set(range(N)) - used, key=lambda q: node[q]))
+            if(len(unused) >= M):
+                cost = sum([p[0] for p in chosen]) + sum([node[q] for q in unused[:M]])
+                heapq.heappush(heap, (cost, count, ranks, (cost, tuple(placed), unused, tuple(range(M)), M - 1 if (M > 0) else 0)))
+                count += 1
+
+        # the next combinations: increase the rank of one component
+        for c in range(len(ranks)):
+            nranks = ranks[:c] + (ranks[c] + 1,) + ranks[c + 1:]
+            later  = [ranks[d] for d in range(c + 1, len(ranks)) if member[d][0] is member[c][0]]
+            if((nranks in seen) or ((len(later) > 0) and (nranks[c] >= min(later))) or (placement(c, nranks[c]) is None)): continue
+            seen.add(nranks)
+            heapq.heappush(heap, (sum([placement(d, r)[0] for (d, r) in enumerate(nranks)]) + bound[M], count, nranks, None))
+            count += 1
+    return result
+
+def rankPlacements(node, edge, edges, K):
+    """
+    Yield the placements (cost, qubits) of K relative qubits connected by the edges in order of cost, where qubits[i] is
+    the qubit for the relative qubit i, and only the best placement of each set of qubits is given. \n
+    Inputs:
+        node  - cost of each qubit (N array), see qubitCosts
+        edge  - cost of the two qubit gate [control, target] (N x N array, inf if the gate doesn't exist), see qubitCosts
+        edges - list of (control, target) pairs of the relative qubit index (from 0 to K - 1), which form a connected graph
+        K     - number of relative qubits
+    """
+    N = len(node)
+    adjacency = [set() for i in range(K)]
+    for (i, j) in edges:
+        adjacency[i].add(j)
+        adjacency[j].add(i)
+
+    # the relative qubits are placed one at a time in the breadth-first order from the one with the most edges,
+    # so that each one (except the first one) is placed on a neighbor of its placed neighbor
+    root   = max(range(K), key=lambda i: len(adjacency[i]))
+    order  = [root]
+    anchor = [-1] # placed neighbor (position in order) of each relative qubit in order
+    for i in order:
+        for j in sorted(adjacency[i] - set(order)):
+            order.append(j)
+            anchor.append(order.index(i))
+    position = {i: t for (t, i) in enumerate(order)}
+
+    # the edges which are complete once the relative qubit order[t] is placed: (position of control, position of target)
+    pairs  = [[] for t in range(K)]
+    for (i, j) in edges:
+        pairs[max(position[i], position[j])].append((position[i], position[j]))
+    remain = [len(edges) - sum([len(p) for p in pairs[:t + 1]]) for t in range(K)]
+
+    # best-first (A*) search over the partial placements, where the lower bound of the remaining cost is
+    # the sum of the r cheapest qubits for the r unplaced qubits and the cheapest edge for each of the incomplete edges
+    neighbors = [np.nonzero(np.isfinite(edge[q]) | np.isfinite(edge[:, q]))[0].tolist() for q in range(N)]
+    finite    = edge[np.isfinite(edge)]
+    (bound1, bound2) = (np.concatenate([[0.0], np.cumsum(np.sort(node))]), np.min(finite) if (len(finite) > 0) else 0.0)
+
+    heap  = [(0.0, 0.0, ())]
+    found = set()
+    while(len(heap) > 0):
+        (priority, cost, placed) = heapq.heappop(heap)
+        t = len(placed)
+        if(t == K):
+            if(frozenset(placed) not in found):
+                found.add(frozenset(placed))
+                yield (cost, tuple([placed[position[i]] for i in range(K)]))
+            continue
+
+        for v in (neighbors[placed[anchor[t]]] if (anchor[t] >= 0) else range(N)):
+            if(v in placed): continue
+            grown = placed + (v,)
+            added = cost + node[v] + sum([edge[grown[a], grown[b]] for (a, b) in pairs[t]])
+            if(np.isfinite(added)):
+                heapq.heappush(heap, (added + bound1[K - t - 1] + remain[t] * bound2, added, grown))
+
+def qubitCosts(device, duration=0.0, gates1=0, gate2='cx'):
+    """
+    Return (node, edge), the cost (-log of the success probability) of each qubit (N array) and of the two qubit gate
+    [control, target] (N x N array, inf if the gate doesn't exist), see selectQubits
+    """
+    N      = device.getN()
+    table  = device.getGateTable()
+    qubits = table.getQubits()
+    errors = np.nan_to_num(table.getErrors(), nan=0.0)
+
+    # mean error of the single qubit gates on each qubit
+    single = np.nonzero((qubits[:, 0] >= 0) & (np.sum(qubits >= 0, axis=1) == 1))[0]
+    total  = np.bincount(qubits[single, 0], weights=errors[single], minlength=N)
+    count  = np.bincount(qubits[single, 0], minlength=N)
+    e1     = np.divide(total, count, out=np.zeros(N), where=(count > 0))
+
+    Gamma1 = np.nan_to_num(np.array(device.getGamma1_list(), dtype=float), nan=0.0) if (len(device.getGamma1_list()) == N) else np.zeros(N)
+    Gamma2 = np.nan_to_num(np.array(device.getGamma2_list(), dtype=float), nan=0.0) if (len(device.getGamma2_list()) == N) else np.zeros(N)
+    node   = gates1 * - np.log1p(- np.minimum(e1, 1 - 1e-15)) + duration * (Gamma1 + Gamma2)
+
+    # two qubit gates from control to target
+    edge = np.full((N, N), np.inf)
+    rows = table.select(gate2)
+    if(len(rows) > 0):
+        (a, b) = (qubits[rows, 0], qubits[rows, 1])
+        cost   = - np.log1p(- np.minimum(errors[rows], 1 - 1e-15))
+        np.minimum.at(edge, (a, b), cost)
+    return (node, edge)
@@ -25,6 +25,8 @@
 from QuAwesome.Device     import Device
 from QuAwesome.exceptions import QuAwesomeError
 from QuAwesome.DataManager import DataManager
+from QuAwesome.CalibrationStore import CalibrationStore
+from QuAwesome.QubitSelection import selectQubits
 from QuAwesome.WorkExtraction import WorkExtraction
 from QuAwesome.Maximum_Likelihood_Estimation import MLE
 from QuAwesome.QuantumNoiseSimulator.QuantumNoiseSimulator import QuantumNoiseSimulator
\ No newline at end of file